@@ -5,7 +5,7 @@
 
 {
     'name': 'Account Move Import',
-    'version': '17.0.1.0.0',
+    'version': '17.0.2.0.0',
     'category': 'Accounting',
     'summary': 'Import account moves generated by external software',
     'license': 'AGPL-3',
@@ -22,7 +22,7 @@ This module currently supports:
 * XLSX files,
 * LibreOffice CSV export files,
 * MeilleureGestion.com payroll CSV files,
-* Quadra export files,
+* Quadra export files (with analytic),
 * In Extenso,
 * Ciel paye,
 * Payfit,
@@ -30,8 +30,26 @@ This module currently supports:
 
 This module can easily be extended to support other formats.
 
+Several files of the same format can be imported together by uploading
+a ZIP file: they are checked and imported in the same run.
+
+To import the history of a company from FEC files, the *Migration* creation
+mode inserts the journal entries with SQL queries, which is much faster.
+The result is checked against the standard creation of the first journal
+entry, and the totals are checked at the end of the import.
+
 This module also supports account move line reconciliation (used for FEC import).
 
+Big files can be imported in background: the import is then processed
+by a scheduled action, with a commit after each chunk of journal entries,
+and its progress is visible in the menu *Journal Entry Import Jobs*.
+This menu also lists the imports that were not run in background, with
+the duration and the number of SQL queries of each stage of the import.
+
+A file that has already been imported is refused, and the journal entries
+of a file that have already been imported from another file (same journal,
+date, number and amounts) are skipped.
+
 There are many community modules that handle the import of account moves
 via CSV/XLSX files.
 But I decided to develop this module because I wanted a module with
@@ -48,13 +66,16 @@ from Akretion (alexis.delattre@akretion.com).
     'website': 'http://www.akretion.com',
     'depends': ['account'],
     'demo': ['demo/demo.xml'],
-    # for the moment, I don't add the 'rows' lib in external_dependencies
-    # I wait a new release on pypi https://github.com/turicas/rows/issues/368
+    # ODS files are read with lxml (a dependency of Odoo), no need for the 'rows' lib
     'external_dependencies': {'python': ['openpyxl', 'xlrd']},
     'data': [
         'data/sequence.xml',
+        'data/ir_cron.xml',
         'security/ir.model.access.csv',
+        'security/ir_rule.xml',
         'wizard/account_move_import_view.xml',
+        'wizard/account_move_import_delete_view.xml',
+        'views/account_move_import_job_view.xml',
     ],
     'installable': True,
 }
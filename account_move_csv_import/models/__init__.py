@@ -1 +1,7 @@
+from . import account_move
 from . import account_move_line
+from . import account_move_import_job
+from . import res_partner
+from . import account_account
+from . import account_analytic_account
+from . import account_journal
@@ -0,0 +1,27 @@
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+# Fields used by account.move.import's _prepare_speeddict()
+SPEEDDICT_FIELDS = {'code', 'company_id', 'deprecated'}
+
+
+class AccountAccount(models.Model):
+    _inherit = "account.account"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        if vals_list:
+            self.env['account.move.import']._bump_speeddict_version()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if SPEEDDICT_FIELDS.intersection(vals):
+            self.env['account.move.import']._bump_speeddict_version()
+        return super().write(vals)
+
+    def unlink(self):
+        if self:
+            self.env['account.move.import']._bump_speeddict_version()
+        return super().unlink()
@@ -0,0 +1,13 @@
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import fields, models
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    # Hash of the journal, date, number and amounts of an imported move
+    # (cf move_fingerprint()), to skip it when it is in another file
+    import_fingerprint = fields.Char(
+        index='btree_not_null', copy=False, readonly=True)
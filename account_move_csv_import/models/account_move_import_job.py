@@ -0,0 +1,333 @@
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from ..wizard.import_stats import ImportStats
+from ..wizard.import_tools import ImportJobPaused, ImportValidationError
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# first key of the PostgreSQL advisory lock held while a job runs,
+# the second key is the ID of the job
+JOB_LOCK_KEY = 0x4d4f5645
+# number of times an interrupted job is resumed by the cron
+# without any progress since the previous interruption
+MAX_AUTO_RESUME = 3
+# number of chunks of journal entries created by a run of the cron
+CRON_MAX_CHUNKS = 20
+
+
+class AccountMoveImportJob(models.Model):
+    _name = "account.move.import.job"
+    _description = "Journal Entry Import Job"
+    _order = "id desc"
+    _check_company_auto = True
+
+    name = fields.Char(string='File Name', required=True, readonly=True)
+    company_id = fields.Many2one(
+        'res.company', string='Company', required=True, readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ], default='pending', required=True, readonly=True, index=True)
+    file_format = fields.Selection(
+        selection=lambda self: self.env['account.move.import']._fields['file_format'].selection,
+        string='File Format', readonly=True)
+    attachment_id = fields.Many2one(
+        'ir.attachment', string='File', readonly=True, ondelete='restrict')
+    # checksum of the file (same as ir.attachment), to detect
+    # that a file is uploaded again
+    file_hash = fields.Char(readonly=True, index=True)
+    # values of the account.move.import wizard, to create it again in the cron
+    import_options = fields.Json(readonly=True)
+    start_date = fields.Datetime(readonly=True)
+    end_date = fields.Datetime(readonly=True)
+    line_count = fields.Integer(string='Lines', readonly=True)
+    move_count = fields.Integer(string='Journal Entries', readonly=True)
+    created_line_count = fields.Integer(string='Created Lines', readonly=True)
+    skipped_move_count = fields.Integer(
+        string='Skipped Journal Entries', readonly=True,
+        help="Journal entries of the file that have already been imported "
+        "from another file.")
+    progress = fields.Float(compute='_compute_progress')
+    error_message = fields.Text(readonly=True)
+    error_report = fields.Binary(string='Error Report', readonly=True)
+    error_report_filename = fields.Char()
+    # Checkpoint to resume an interrupted import: the lines of the file
+    # up to last_line have been imported with import_sequence. For a ZIP
+    # archive, last_line is a line of the file number last_file_index
+    # (the previous files have been imported). The parsing of the file
+    # is resumed after this line, cf _iter_pivot().
+    validated = fields.Boolean(string='File Checked', readonly=True)
+    import_sequence = fields.Char(readonly=True)
+    last_file_index = fields.Integer(readonly=True)
+    last_line = fields.Integer(string='Last Imported Line', readonly=True)
+    # Checkpoint of the check of the file, before it is validated:
+    # position, counters and journal entry numbers of the checked lines
+    check_checkpoint = fields.Json(readonly=True)
+    resume_count = fields.Integer(readonly=True)
+    # number of checked and imported lines when the job was last resumed
+    resume_progress = fields.Integer(readonly=True)
+    move_ids = fields.Many2many(
+        'account.move', string='Created Journal Entries', readonly=True)
+    # already imported journal entries of the file, to number the
+    # fingerprints of the next ones when the job is resumed
+    skipped_move_ids = fields.Many2many(
+        'account.move', 'account_move_import_job_skipped_rel', 'job_id', 'move_id',
+        string='Skipped Journal Entries', readonly=True)
+    # time and SQL queries of each stage of the import, cf ImportStats
+    stats = fields.Json(readonly=True)
+    stats_summary = fields.Text(compute='_compute_stats_summary', string='Statistics')
+    profile_result = fields.Text(string='Profiling', readonly=True)
+
+    @api.depends('line_count', 'created_line_count', 'state')
+    def _compute_progress(self):
+        for job in self:
+            progress = 0.0
+            if job.state == 'done':
+                progress = 100.0
+            elif job.line_count:
+                progress = 100.0 * job.created_line_count / job.line_count
+            job.progress = progress
+
+    @api.depends('stats')
+    def _compute_stats_summary(self):
+        for job in self:
+            job.stats_summary = job.stats and ImportStats.format_summary(job.stats) or False
+
+    # Don't commit nor rollback in tests, it would break the test transaction
+    def _commit(self):
+        if not getattr(threading.current_thread(), 'testing', False):
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    def _rollback(self):
+        if not getattr(threading.current_thread(), 'testing', False):
+            self.env.cr.rollback()
+
+    @api.model
+    def _cron_run_import_jobs(self):
+        # Each run of the cron creates a limited number of chunks of one job,
+        # so that the time limit of the cron doesn't limit the size of the
+        # files. The cron is triggered again while there are pending jobs.
+        self._requeue_interrupted_jobs()
+        job = self.search([('state', '=', 'pending')], order='id', limit=1)
+        if not job:
+            return
+        job.with_context(import_job_max_chunks=CRON_MAX_CHUNKS)._run()
+        if self.search_count([('state', '=', 'pending')]):
+            self._trigger_cron()
+
+    def _try_lock(self):
+        self.env.cr.execute(
+            'SELECT pg_try_advisory_lock(%s, %s)', (JOB_LOCK_KEY, self.id))
+        return self.env.cr.fetchone()[0]
+
+    def _unlock(self):
+        self.env.cr.execute(
+            'SELECT pg_advisory_unlock(%s, %s)', (JOB_LOCK_KEY, self.id))
+
+    @api.model
+    def _requeue_interrupted_jobs(self):
+        # A running job holds an advisory lock until it ends. If the lock
+        # is free, the process that ran the job has been killed (timeout,
+        # out of memory...) and the job can be resumed from its checkpoint.
+        for job in self.search([('state', '=', 'running')]):
+            if not job._try_lock():
+                continue
+            job._unlock()
+            progress = job._get_progress_line_count()
+            # the job is only given up when it is interrupted again and again
+            # at the same place, not when each run imports a part of the file
+            resume_count = progress > job.resume_progress and 0 or job.resume_count
+            if resume_count >= MAX_AUTO_RESUME:
+                logger.warning('Journal entry import job %s interrupted again', job.id)
+                job.write({
+                    'state': 'failed',
+                    'end_date': fields.Datetime.now(),
+                    'error_message': _(
+                        "The import was interrupted %d times without progress, "
+                        "it has not been resumed again.") % (resume_count + 1),
+                    })
+            else:
+                logger.warning(
+                    'Journal entry import job %s was interrupted after %d checked '
+                    'or imported lines, it will be resumed', job.id, progress)
+                job.write({
+                    'state': 'pending',
+                    'resume_count': resume_count + 1,
+                    'resume_progress': progress,
+                    })
+            self._commit()
+
+    def _get_progress_line_count(self):
+        # Lines of the file that won't be checked nor imported again
+        if self.validated:
+            checked_line_count = self.line_count
+        else:
+            checked_line_count = (self.check_checkpoint or {}).get('line_count', 0)
+        return checked_line_count + self.created_line_count
+
+    def _trigger_cron(self):
+        self.env.ref('account_move_csv_import.ir_cron_account_move_import_job')._trigger()
+
+    def _run(self):
+        self.ensure_one()
+        if not self._try_lock():
+            logger.info('Journal entry import job %s is already running', self.id)
+            return
+        try:
+            self._run_locked()
+        finally:
+            self._unlock()
+
+    def _run_locked(self):
+        logger.info('Start journal entry import job %s (%s)', self.id, self.name)
+        self.write({
+            'state': 'running',
+            # a big file is imported by several runs of the cron
+            'start_date': self.start_date or fields.Datetime.now(),
+            'error_message': False,
+            'error_report': False,
+            })
+        self._commit()
+        try:
+            # The wizard is created with the user who uploaded the file,
+            # so that the access rights are the ones of this user
+            wiz = self.env['account.move.import'].with_user(self.create_uid).with_company(
+                self.company_id).create(dict(self.import_options, import_job_id=self.id))
+            with wiz._open_attachment(self.attachment_id) as fileobj:
+                wiz._import_file(fileobj)
+        except ImportJobPaused:
+            # the created chunks have been committed with the checkpoint,
+            # the stats of the run are committed with the state
+            logger.info(
+                'Journal entry import job %s paused after line %d',
+                self.id, self.last_line)
+            self.write({'state': 'pending'})
+        except Exception as e:
+            self._rollback()
+            logger.exception('Journal entry import job %s failed', self.id)
+            error_message = str(e)
+            report = isinstance(e, ImportValidationError) and e.report or False
+            self.write(self.env['account.move.import']._prepare_error_report_vals(report))
+            if self.move_ids:
+                error_message = _(
+                    "%s\n\n%d journal entries were created and committed "
+                    "before the failure, up to line %d. Run the job again "
+                    "to resume the import after this line.") % (
+                    error_message, len(self.move_ids), self.last_line)
+            self.write({
+                'state': 'failed',
+                'end_date': fields.Datetime.now(),
+                'error_message': error_message,
+                })
+        else:
+            self.write({'state': 'done', 'end_date': fields.Datetime.now()})
+            logger.info('Journal entry import job %s done', self.id)
+        self._commit()
+
+    def _set_validated(self, line_count, move_count, import_sequence):
+        self.write({
+            'line_count': line_count,
+            'move_count': move_count,
+            'import_sequence': import_sequence,
+            'validated': True,
+            'check_checkpoint': False,
+            })
+        self._commit()
+
+    def _save_check_checkpoint(self, checkpoint):
+        # the check of the file will be resumed after this checkpoint
+        self.check_checkpoint = checkpoint
+        self._commit()
+
+    def _chunk_created(self, moves, line_count, checkpoint):
+        # the checkpoint is committed with the moves
+        skipped_move_ids = checkpoint.get('skipped_move_ids', [])
+        self.write({
+            'move_ids': [(4, move.id) for move in moves],
+            'created_line_count': self.created_line_count + line_count,
+            'last_file_index': checkpoint.get('file_index', 0),
+            'last_line': checkpoint.get('line', 0),
+            'skipped_move_count': checkpoint.get('skipped_moves', 0),
+            'skipped_move_ids': [(4, move_id) for move_id in skipped_move_ids],
+            })
+        self._commit()
+        skipped_move_ids.clear()
+
+    def _get_fingerprint_occurrences(self, fingerprints):
+        # Number of occurrences of these move fingerprints in the journal
+        # entries created or skipped by the job, i.e. in the part of the
+        # files before the checkpoint. The occurrence N > 1 of a fingerprint
+        # is stored as 'fingerprint-N', cf _number_fingerprint().
+        self.ensure_one()
+        self.flush_model(['move_ids', 'skipped_move_ids'])
+        created, skipped = self._fields['move_ids'], self._fields['skipped_move_ids']
+        query = """
+            SELECT import_fingerprint FROM account_move
+            WHERE import_fingerprint = ANY(%s) AND id IN (
+                SELECT {created_move} FROM {created} WHERE {created_job} = %s
+                UNION ALL
+                SELECT {skipped_move} FROM {skipped} WHERE {skipped_job} = %s)
+            """.format(
+            created=created.relation, created_job=created.column1,
+            created_move=created.column2, skipped=skipped.relation,
+            skipped_job=skipped.column1, skipped_move=skipped.column2)
+        res = dict.fromkeys(fingerprints, 0)
+        todo = list(fingerprints)
+        occurrence = 1
+        while todo:
+            names = {
+                occurrence > 1 and '%s-%d' % (fingerprint, occurrence) or fingerprint:
+                fingerprint for fingerprint in todo}
+            self.env.cr.execute(query, (list(names), self.id, self.id))
+            todo = [names[name] for (name, ) in self.env.cr.fetchall()]
+            for fingerprint in todo:
+                res[fingerprint] = occurrence
+            occurrence += 1
+        return res
+
+    @api.model
+    def _find_resumable_job(self, vals):
+        # Failed job of the same file with the same options
+        jobs = self.search([
+            ('company_id', '=', vals['company_id']),
+            ('state', '=', 'failed'),
+            ('file_hash', '=', vals['file_hash']),
+            ])
+        return jobs.filtered(lambda job: job.import_options == vals['import_options'])[:1]
+
+    @api.model
+    def _find_imported_job(self, company_id, file_hash):
+        # Import of the same file whose journal entries still exist
+        # (the deleted moves are removed from move_ids)
+        return self.search([
+            ('company_id', '=', company_id),
+            ('state', '=', 'done'),
+            ('file_hash', '=', file_hash),
+            ('move_ids', '!=', False),
+            ], limit=1)
+
+    def button_requeue(self):
+        # The jobs that have created journal entries before failing are
+        # resumed after the last line that was imported
+        for job in self:
+            if job.state != 'failed':
+                raise UserError(_("Only failed import jobs can be run again."))
+        self.write({'state': 'pending', 'resume_count': 0})
+        self._trigger_cron()
+
+    def unlink(self):
+        attachments = self.attachment_id
+        res = super().unlink()
+        attachments.unlink()
+        return res
+
+    def button_open_moves(self):
+        self.ensure_one()
+        return self.env['account.move.import']._prepare_moves_action(self.move_ids)
@@ -8,9 +8,12 @@ from odoo import fields, models
 class AccountMoveLine(models.Model):
     _inherit = "account.move.line"
 
-    import_reconcile = fields.Char(string='Import Reconcile Ref')
+    import_reconcile = fields.Char(
+        string='Import Reconcile Ref', index='btree_not_null')
+    # trigram index to search all the lines of an import with
+    # import_external_id =like 'IMPORT042-%'
     import_external_id = fields.Char(
-        string="Import External ID",
+        string="Import External ID", index='trigram',
         help='Can be used to tag imported journal items. '
              'Can be useful to delete imported journal items in case of '
              'error on the imported file.')
@@ -0,0 +1,37 @@
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+# Fields used by account.move.import's _prepare_partner_speeddict()
+SPEEDDICT_FIELDS = {'ref', 'parent_id', 'company_id', 'active'}
+
+
+class ResPartner(models.Model):
+    _inherit = "res.partner"
+
+    def _in_import_speeddict(self):
+        # Only the commercial partners with a ref are in the speeddict
+        return any(partner.ref and not partner.parent_id for partner in self)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partners = super().create(vals_list)
+        if partners._in_import_speeddict():
+            self.env['account.move.import']._bump_speeddict_version()
+        return partners
+
+    def write(self, vals):
+        if not SPEEDDICT_FIELDS.intersection(vals):
+            return super().write(vals)
+        # The partners may leave the speeddict or enter it
+        bump = self._in_import_speeddict()
+        res = super().write(vals)
+        if bump or self._in_import_speeddict():
+            self.env['account.move.import']._bump_speeddict_version()
+        return res
+
+    def unlink(self):
+        if self._in_import_speeddict():
+            self.env['account.move.import']._bump_speeddict_version()
+        return super().unlink()
@@ -0,0 +1,286 @@
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import base64
+import os
+from datetime import date
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from ..wizard.import_tools import ErrorBudget, ImportValidationError, \
+    iter_pivot_chunks
+
+
+@tagged('post_install', '-at_install')
+class TestAccountMoveImport(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.company = cls.company_data['company']
+        cls.journal = cls.env['account.journal'].create({
+            'name': 'Import OD', 'code': 'OD', 'type': 'general',
+            'company_id': cls.company.id})
+        cls.account_486 = cls.env['account.account'].create({
+            'code': '486000', 'name': 'Charges constatées d’avance',
+            'account_type': 'asset_prepayments', 'reconcile': True,
+            'company_id': cls.company.id})
+        cls.account_611 = cls.env['account.account'].create({
+            'code': '611000', 'name': 'Sous-traitance',
+            'account_type': 'expense', 'company_id': cls.company.id})
+        cls.partner = cls.env['res.partner'].create({
+            'name': 'Import Partner', 'ref': 'X1242', 'company_id': False})
+        plan = cls.env['account.analytic.plan'].create({'name': 'Import'})
+        cls.analytic = cls.env['account.analytic.account'].create({
+            'name': 'Purchases', 'code': 'PUR', 'plan_id': plan.id,
+            'company_id': cls.company.id})
+
+    def _read_test_file(self, filename):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _create_wizard(self, file_content, **vals):
+        return self.env['account.move.import'].create(dict({
+            'company_id': self.company.id,
+            'file_to_import': base64.b64encode(file_content),
+            'filename': 'test.csv',
+            'file_format': 'genericcsv',
+            'post_move': True,
+            }, **vals))
+
+    def _import(self, file_content, **vals):
+        wiz = self._create_wizard(file_content, **vals)
+        action = wiz.run_import()
+        if action.get('res_model') == 'account.move.import':
+            # the wizard is shown again with the errors
+            return wiz, self.env['account.move']
+        if action.get('res_id'):
+            return wiz, self.env['account.move'].browse(action['res_id'])
+        return wiz, self.env['account.move'].search(action['domain'], order='id')
+
+    def _import_check_values(self, file_content, **vals):
+        # Import the file in a savepoint that is rolled back, and return
+        # the stored values of the moves and their lines
+        with self.env.cr.savepoint() as savepoint:
+            wiz, moves = self._import(file_content, **vals)
+            self.assertTrue(moves, wiz.check_result)
+            res = []
+            for move in moves:
+                for label, values in wiz._get_move_check_values(move):
+                    if values.get('import_external_id'):
+                        # the sequence of the import is not rolled back
+                        values['import_external_id'] = values['import_external_id'].split('-', 1)[1]
+                    res.append(('%s %s' % (move.ref, label), values))
+            savepoint.rollback()
+        self.env.invalidate_all()
+        return res
+
+    def test_import_generic_csv(self):
+        wiz, moves = self._import(self._read_test_file('generic_csv_fr_ok.csv'))
+        self.assertEqual(len(moves), 2)
+        self.assertEqual(set(moves.mapped('state')), {'posted'})
+        self.assertEqual(moves.journal_id, self.journal)
+        line = moves.line_ids.filtered(lambda l: l.account_id == self.account_611)[0]
+        self.assertEqual(line.partner_id, self.partner)
+        self.assertEqual(line.analytic_distribution, {str(self.analytic.id): 100})
+        self.assertTrue(
+            moves.line_ids.filtered(lambda l: l.import_reconcile == 'A1').full_reconcile_id)
+
+    def test_import_generic_csv_errors(self):
+        wiz, moves = self._import(self._read_test_file('generic_csv_fr_ko.csv'))
+        self.assertFalse(moves)
+        self.assertIn('HAH', wiz.check_result)
+        self.assertTrue(wiz.error_report)
+
+    def test_high_volume_same_as_standard(self):
+        file_content = self._read_test_file('generic_csv_fr_ok.csv')
+        standard = self._import_check_values(file_content, creation_mode='orm')
+        high_volume = self._import_check_values(file_content, creation_mode='orm_fast')
+        self.assertEqual(len(standard), len(high_volume))
+        for (label, standard_values), (label, values) in zip(standard, high_volume):
+            self.assertEqual(values, standard_values, label)
+
+    def test_unbalanced_move(self):
+        # The first move is not balanced, but it is cut from the next one
+        # because the date changes: it must be refused in all the modes
+        file_content = (
+            b'31/01/2020,OD,486000,,,Unbalanced,100,,REF1,\n'
+            b'31/01/2020,OD,611000,,,Unbalanced,,90,REF1,\n'
+            b'01/02/2020,OD,486000,,,Balanced,5,,REF2,\n'
+            b'01/02/2020,OD,611000,,,Balanced,,5,REF2,\n')
+        for creation_mode in ('orm', 'orm_fast'):
+            wiz, moves = self._import(file_content, creation_mode=creation_mode)
+            self.assertFalse(moves)
+            self.assertIn('Line 1', wiz.check_result)
+            self.assertIn('not balanced', wiz.check_result)
+
+    def _quadra_move_line(self, account, sign, amount_cents):
+        return 'M%-8s%-2s%3s%6s%1s%-20s%1s%+013d' % (
+            account, 'OD', '000', '310120', ' ', 'Quadra', sign, amount_cents)
+
+    def test_import_quadra_analytic(self):
+        # I records without percentage: it is computed from the amount
+        file_content = '\r\n'.join([
+            self._quadra_move_line('611000', 'D', 10000),
+            'I%5s%+013d%-10s' % ('', 2500, 'PUR'),
+            'I%5s%+013d%-10s' % ('', 7500, 'ADM'),
+            self._quadra_move_line('486000', 'C', 10000),
+            ]).encode('ascii')
+        adm = self.analytic.copy({'name': 'Administration', 'code': 'ADM'})
+        wiz, moves = self._import(
+            file_content, file_format='quadra', file_encoding='ascii')
+        self.assertEqual(len(moves), 1, wiz.check_result)
+        line = moves.line_ids.filtered(lambda l: l.account_id == self.account_611)
+        self.assertEqual(line.analytic_distribution, {
+            str(self.analytic.id): 25.0, str(adm.id): 75.0})
+
+    def test_speeddict_cache(self):
+        wiz = self._create_wizard(b'')
+        speeddict = wiz._prepare_import_speeddict(self.company.id)
+        self.assertNotIn('622000', speeddict['account'])
+        account = self.env['account.account'].create({
+            'code': '622000', 'name': 'Honoraires',
+            'account_type': 'expense', 'company_id': self.company.id})
+        new_speeddict = wiz._prepare_import_speeddict(self.company.id)
+        self.assertEqual(new_speeddict['account']['622000'], account.id)
+        # the matches of the codes of a file are not shared with other imports
+        self.assertIsNot(
+            new_speeddict['account_resolver'],
+            wiz._prepare_import_speeddict(self.company.id)['account_resolver'])
+
+    def test_skip_imported_moves(self):
+        file_content = self._read_test_file('generic_csv_fr_ok.csv')
+        self._import(file_content)
+        other_partner = self.partner.copy({'ref': 'X1243'})
+        # the first move again, and the same move with another partner
+        first_move = b''.join(file_content.splitlines(True)[:2])
+        wiz, moves = self._import(first_move + first_move.replace(b'X1242', b'X1243'))
+        self.assertEqual(wiz.skipped_move_count, 1)
+        self.assertEqual(len(moves), 1)
+        self.assertEqual(moves.line_ids.partner_id, other_partner)
+
+    def _prepare_named_move_pivot(self, move_name, amount):
+        vals = {
+            'date': date(2020, 1, 31), 'journal': 'OD', 'name': 'Named move',
+            'move_name': move_name, 'partner': False, 'analytic': False,
+            'ref': False, 'reconcile_ref': False}
+        return [
+            dict(vals, account='611000', debit=amount, credit=0.0, line=1),
+            dict(vals, account='486000', debit=0.0, credit=amount, line=2),
+            ]
+
+    def test_existing_move_name(self):
+        wiz = self._create_wizard(b'', split_move_method='move_name')
+        wiz.create_moves_from_pivot(
+            self._prepare_named_move_pivot('OD/IMP/1', 100.0), post=True)
+        # the same move is skipped
+        moves = wiz.create_moves_from_pivot(
+            self._prepare_named_move_pivot('OD/IMP/1', 100.0), post=True)
+        self.assertFalse(moves)
+        # the same number with other amounts is refused
+        with self.assertRaisesRegex(ImportValidationError, 'OD/IMP/1'):
+            wiz.create_moves_from_pivot(
+                self._prepare_named_move_pivot('OD/IMP/1', 120.0), post=True)
+
+    def test_parallel_check_chunks(self):
+        # An unbalanced move followed by a move in another journal: the
+        # balance of the file is 0 inside the second move, which must not
+        # be cut between 2 chunks
+        pivot = []
+        for i in range(20):
+            for journal, debit, credit in [
+                    ('OD', 10.0, 0.0), ('OD', 0.0, 9.0),
+                    ('MISC', 0.0, 1.0), ('MISC', 5.0, 0.0), ('MISC', 0.0, 5.0)]:
+                pivot.append({
+                    'journal': journal, 'date': date(2020, 1, 31),
+                    'debit': debit, 'credit': credit, 'line': len(pivot) + 1})
+        wiz = self._create_wizard(b'')
+        options = wiz._prepare_split_options()
+        chunks = list(iter_pivot_chunks(pivot, options, 7, {'OD': 1, 'MISC': 2}))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), len(pivot))
+        for chunk in chunks:
+            # each chunk starts with the first line of a move
+            self.assertIn(chunk[0]['line'] % 5, (1, 3))
+
+    def test_requeue_interrupted_job(self):
+        job_model = self.env['account.move.import.job']
+        vals = {
+            'name': 'big.csv', 'company_id': self.company.id, 'state': 'running',
+            'validated': True, 'line_count': 10000, 'resume_count': 3}
+        # interrupted again after having imported more lines: resumed
+        job = job_model.create(dict(vals, created_line_count=2000, resume_progress=11000))
+        # interrupted again at the same place: given up
+        stuck_job = job_model.create(dict(vals, created_line_count=1000, resume_progress=11000))
+        job_model._requeue_interrupted_jobs()
+        self.assertEqual(job.state, 'pending')
+        self.assertEqual(job.resume_count, 1)
+        self.assertEqual(job.resume_progress, 12000)
+        self.assertEqual(stuck_job.state, 'failed')
+
+    def test_import_job_by_chunks(self):
+        wiz = self._create_wizard(
+            self._read_test_file('generic_csv_fr_ok.csv'),
+            async_import=True, create_chunk_size=1)
+        job = self.env['account.move.import.job'].browse(wiz.run_import()['res_id'])
+        # a run of the cron creates a limited number of chunks
+        job.with_context(import_job_max_chunks=1)._run()
+        self.assertEqual(job.state, 'pending')
+        self.assertEqual(len(job.move_ids), 1)
+        self.assertEqual(job.last_line, 2)
+        # the stats of the paused run are saved
+        self.assertEqual(job.stats['counters']['created_moves'], 1)
+        job.with_context(import_job_max_chunks=1)._run()
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(len(job.move_ids), 2)
+        # and added to the ones of the next run
+        self.assertEqual(job.stats['counters']['created_moves'], 2)
+        self.assertEqual(job.stats['counters']['lines'], 4)
+
+    def test_resume_import_job(self):
+        # The same move twice: after the pause, the parsing restarts after
+        # the checkpoint and the second move is still numbered as the
+        # second occurrence of its fingerprint
+        first_move = b''.join(
+            self._read_test_file('generic_csv_fr_ok.csv').splitlines(True)[:2])
+        wiz = self._create_wizard(first_move * 2, async_import=True, create_chunk_size=1)
+        job = self.env['account.move.import.job'].browse(wiz.run_import()['res_id'])
+        job.with_context(import_job_max_chunks=1)._run()
+        self.assertEqual(job.last_line, 2)
+        wiz = self.env['account.move.import'].create(dict(job.import_options, import_job_id=job.id))
+        with wiz._open_attachment(job.attachment_id) as fileobj:
+            lines = [l['line'] for l in wiz._iter_pivot(fileobj, job.last_line)]
+        self.assertEqual(lines, [3, 4])
+        job.with_context(import_job_max_chunks=1)._run()
+        self.assertEqual(job.state, 'done')
+        fingerprints = job.move_ids.sorted('id').mapped('import_fingerprint')
+        self.assertEqual(len(fingerprints), 2)
+        self.assertEqual(fingerprints[1], '%s-2' % fingerprints[0])
+        self.assertFalse(job.skipped_move_count)
+
+    def test_error_budget_of_archive(self):
+        # the errors of the files of an archive are added
+        budget = ErrorBudget(max_errors=12, max_codes=3)
+        for code in ('X1', 'X2'):
+            errors = {'other': ['error'] * 4, 'account': {code: [1]}}
+            self.assertFalse(budget.check(errors))
+            self.assertFalse(budget.add_file(errors))
+        # 10 errors and 2 distinct codes
+        self.assertFalse(budget.check({'other': [], 'account': {'X1': [1]}}))
+        # 3 distinct codes
+        self.assertTrue(budget.check({'other': [], 'account': {'X3': [1]}}))
+        budget = ErrorBudget(max_errors=12)
+        budget.add_file({'other': ['error'] * 10})
+        self.assertTrue(budget.check({'other': ['error'] * 2}))
+
+    def test_check_imported_file(self):
+        file_content = self._read_test_file('generic_csv_fr_ok.csv')
+        self._import(file_content)
+        wiz = self._create_wizard(file_content)
+        # the dry run refuses the file like the import
+        with self.assertRaisesRegex(UserError, 'already been imported'):
+            wiz.button_check()
+        with self.assertRaisesRegex(UserError, 'migration mode'):
+            self._create_wizard(file_content, creation_mode='sql').button_check()
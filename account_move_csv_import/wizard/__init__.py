@@ -1 +1,2 @@
 from . import account_move_import
+from . import account_move_import_delete
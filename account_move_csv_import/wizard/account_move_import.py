@@ -4,13 +4,31 @@
 
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
-from odoo.tools.mimetypes import guess_mimetype
+from odoo.osv import expression
+from odoo.tools import escape_psql, float_compare, ormcache, split_every, str2bool
 from datetime import datetime, date as datelib
+import codecs
 import csv
+import time
+from .import_tools import AccountCodeResolver, ErrorBudget, \
+    ErrorBudgetExceeded, ImportJobPaused, ImportValidationError, PivotLine, collect_move_name, \
+    count_pivot_errors, error_report2csv, init_validation_worker, iter_ods_rows, \
+    iter_pivot_chunks, match_pivot_line, merge_move_names, \
+    merge_pivot_errors, move_fingerprint, parse_amount, parse_date, \
+    skip_rows, split_pivot, validate_pivot_chunk
+from .import_stats import ImportStats
 from tempfile import NamedTemporaryFile
-from collections import OrderedDict
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from functools import partial
 import base64
+import copy
+import json
+import os
+import shutil
+import zipfile
 import logging
+import multiprocessing
 
 logger = logging.getLogger(__name__)
 try:
@@ -21,15 +39,42 @@ try:
     import xlrd  # for XLS
 except ImportError:
     logger.debug('Cannot import xlrd')
-try:
-    import rows  # for ODS... but could be later used for XLS, XLSX, CSV
-    # But they must make a new release first https://github.com/turicas/rows/issues/368
-except ImportError:
-    rows = None
-    logger.debug('Cannot import rows')
 
 
 GENERIC_CSV_DEFAULT_DATE = '%d/%m/%Y'
+CREATE_CHUNK_SIZE = 500
+MOVE_NAME_SEARCH_CHUNK_SIZE = 10000
+FINGERPRINT_CHUNK_SIZE = 1000
+VALIDATION_CHUNK_SIZE = 10000
+# number of checked lines between two checkpoints of the check of an import job
+CHECK_CHECKPOINT_INTERVAL = 100000
+RECONCILE_CHUNK_SIZE = 1000
+# number of rows of the multi-row INSERT queries of the migration mode
+SQL_INSERT_CHUNK_SIZE = 1000
+# fields that are different between the same move created by two
+# creation modes, cf _get_move_check_values()
+MOVE_CHECK_IGNORED_FIELDS = set(models.MAGIC_COLUMNS) | {
+    'name', 'sequence_prefix', 'sequence_number', 'made_sequence_hole',
+    'move_id', 'move_name'}
+MATCH_CHUNK_SIZE = 5000
+PARTNER_SEARCH_CHUNK_SIZE = 1000
+# number of lines checked between two checks of the error budget
+ERROR_BUDGET_CHECK_INTERVAL = 1000
+# the error messages only have a sample of the errors of each category,
+# all the errors are in the CSV error report
+ERROR_SAMPLE_CODES = 20
+ERROR_SAMPLE_LINES = 10
+ERROR_SAMPLE_OTHER = 50
+# number of pivot lines given at once to clean_strip_pivot() and update_pivot()
+PIVOT_BATCH_SIZE = 1000
+# Above this number of partner refs in the file, we load all the partners
+PARTNER_PRELOAD_THRESHOLD = 5000
+# must be a multiple of 4 to decode base64 by chunks
+BASE64_CHUNK_SIZE = 4 * 65536
+# files that tell that a ZIP file is an XLSX or ODS file, not an archive
+SPREADSHEET_ZIP_FILES = {'[Content_Types].xml', 'mimetype'}
+# PostgreSQL sequence used as version of the cached speeddicts
+SPEEDDICT_VERSION_SEQUENCE = 'account_move_import_speeddict_version'
 DELIMITER = {
     'coma': ',',
     'semicolon': ';',
@@ -45,14 +90,17 @@ class AccountMoveImport(models.TransientModel):
     company_id = fields.Many2one(
         'res.company', string='Company',
         required=True, default=lambda self: self.env.company)
-    file_to_import = fields.Binary(string='File to Import')
+    file_to_import = fields.Binary(
+        string='File to Import',
+        help="You can also upload a ZIP file that contains several files "
+        "of the selected format: they will be imported together.")
     filename = fields.Char()
     file_format = fields.Selection([
         ('genericxlsx', 'Generic XLSX/XLS/ODS'),
         ('genericcsv', 'Generic CSV'),
         ('fec_txt', 'FEC (text)'),
         ('nibelis', 'Nibelis (Prisme)'),
-        ('quadra', 'Quadra (without analytic)'),
+        ('quadra', 'Quadra'),
         ('extenso', 'In Extenso'),
         ('cielpaye', 'Ciel Paye'),
         ('payfit', 'Payfit'),
@@ -61,6 +109,11 @@ class AccountMoveImport(models.TransientModel):
         string='Post and Reconcile',
         help="If enabled, the journal entries will be posted and, if the Reconcile Ref "
         "is available in the import file, Odoo will reconcile the journal items.")
+    async_import = fields.Boolean(
+        string='Import in Background',
+        help="If enabled, the file will be imported by a scheduled action, "
+        "with a commit after each chunk of journal entries. Recommended "
+        "for big files.")
     force_journal_id = fields.Many2one(
         'account.journal', string="Force Journal",
         domain="[('company_id', '=', company_id)]", check_company=True,
@@ -79,7 +132,11 @@ class AccountMoveImport(models.TransientModel):
         ('semicolon', 'Semicolon'),
         ('tab', 'Tab'),
         ], default='coma', string="Field Delimiter")
+    check_result = fields.Text(string='Check Result', readonly=True)
+    error_report = fields.Binary(string='Error Report', readonly=True)
+    error_report_filename = fields.Char()
     # technical fields
+    import_job_id = fields.Many2one('account.move.import.job', readonly=True)
     force_move_date_required = fields.Boolean(compute='_compute_force_required')
     force_journal_required = fields.Boolean(compute='_compute_force_required')
     advanced_options = fields.Boolean()
@@ -90,6 +147,13 @@ class AccountMoveImport(models.TransientModel):
         "of journal entries.")
     skip_null_lines = fields.Boolean(
         string="Skip lines with debit = credit = 0")
+    skip_imported_moves = fields.Boolean(
+        string='Skip Already Imported Entries', default=True,
+        help="If enabled, the import is blocked when the same file has "
+        "already been imported, and the journal entries of the file that "
+        "have already been imported from another file (same journal, date, "
+        "number, partners and amounts) are skipped.")
+    skipped_move_count = fields.Integer(readonly=True)
     keep_odoo_move_name = fields.Boolean(
         string="Don't Force Journal Entry Name",
         help="If 'move_name' is present in the pivot format and "
@@ -108,6 +172,60 @@ class AccountMoveImport(models.TransientModel):
     file_with_header = fields.Boolean(
         string='Has Header Line',
         help="Indicate if the first line is a header line and should be ignored.")
+    create_chunk_size = fields.Integer(
+        string='Creation Chunk Size', default=CREATE_CHUNK_SIZE,
+        help="Number of journal entries created and posted at once. Big chunks "
+        "are faster but use more memory and, when importing in background, "
+        "lock more rows until the next commit.")
+
+    creation_mode = fields.Selection([
+        ('orm', 'Standard'),
+        ('orm_fast', 'High Volume'),
+        ('sql', 'Migration (bulk insert)'),
+        ], default='orm', required=True, string='Creation Mode',
+        help="Standard: the journal entries are created and posted like "
+        "in the user interface.\n"
+        "High Volume: the journal entries are created without chatter "
+        "messages nor tracking, and without checking again the balance of "
+        "each journal entry (the import has already checked it).\n"
+        "Migration: for the import of the history of a company from FEC "
+        "files. The journal entries and their items are inserted in the "
+        "database by SQL queries and their computed fields are computed "
+        "for a complete chunk at once. The first journal entry is also "
+        "created in the standard way to check that both give the same "
+        "result, and the totals and the balance of each chunk are checked "
+        "before it is committed.")
+    max_errors = fields.Integer(
+        string='Maximum Errors', default=1000,
+        help="The check of the file stops after this number of errors "
+        "(an unknown code counts for each line where it is used). "
+        "0 means no limit.")
+    max_unknown_codes = fields.Integer(
+        string='Maximum Unknown Codes', default=100,
+        help="The check of the file stops after this number of distinct "
+        "unknown journal, account, partner or analytic codes. "
+        "0 means no limit.")
+    validation_processes = fields.Integer(
+        string='Check Processes', default=1,
+        help="Number of processes used to check the lines of the file "
+        "before the creation of the journal entries. Use several processes "
+        "to speed up the import of very big files on multi-core servers.")
+    profile_import = fields.Boolean(
+        string='Profile Import',
+        help="If enabled, the import is run with the Python profiler and "
+        "the result is stored on the import job. Slows down the import. "
+        "Can also be enabled for all imports with the system parameter "
+        "'account_move_csv_import.profile'.")
+
+    _sql_constraints = [(
+        'create_chunk_size_positive',
+        'CHECK(create_chunk_size > 0)',
+        'The creation chunk size must be positive.'
+        ), (
+        'validation_processes_positive',
+        'CHECK(validation_processes > 0)',
+        'The number of check processes must be positive.'
+        )]
 
     @api.depends('file_format')
     def _compute_force_required(self):
@@ -129,6 +247,14 @@ class AccountMoveImport(models.TransientModel):
     def _set_advanced_options(self, advanced_options):
         self.ensure_one()
         self.write({'advanced_options': advanced_options})
+        return self._reopen_wizard_action()
+
+    @api.onchange('file_to_import', 'file_format')
+    def _onchange_reset_check_result(self):
+        self.check_result = False
+        self.error_report = False
+
+    def _reopen_wizard_action(self):
         action = self.env["ir.actions.actions"]._for_xml_id(
             "account_move_csv_import.account_move_import_action")
         action['res_id'] = self.id
@@ -158,16 +284,18 @@ class AccountMoveImport(models.TransientModel):
     #  3rd line...
     # ]
 
-    def file2pivot(self, fileobj, file_bytes):
+    # file_bytes is not used any more (parsers read fileobj),
+    # but it is kept in the signature for inheriting modules
+    def file2pivot(self, fileobj, file_bytes=None):
         file_format = self.file_format
         if file_format == 'nibelis':
             return self.nibelis2pivot(fileobj)
         elif file_format == 'genericcsv':
             return self.genericcsv2pivot(fileobj)
         elif file_format == 'genericxlsx':
-            return self.genericxlsx_autodetect(fileobj, file_bytes)
+            return self.genericxlsx_autodetect(fileobj)
         elif file_format == 'quadra':
-            return self.quadra2pivot(file_bytes)
+            return self.quadra2pivot(fileobj)
         elif file_format == 'extenso':
             return self.extenso2pivot(fileobj)
         elif file_format == 'payfit':
@@ -181,20 +309,266 @@ class AccountMoveImport(models.TransientModel):
 
     def run_import(self):
         self.ensure_one()
-        if not self.file_to_import:
+        self._check_import()
+        if self.async_import:
+            return self._create_import_job()
+        try:
+            with self._open_attachment(self._get_file_attachment()) as fileobj:
+                moves = self._import_file(fileobj)
+        except ImportValidationError as e:
+            # Nothing has been created: the errors are shown in the wizard,
+            # with the full list of errors in a CSV file
+            self.write(dict(
+                self._prepare_error_report_vals(e.report),
+                check_result=_("The file has errors, it cannot be imported.\n\n%s") % e.args[0]))
+            return self._reopen_wizard_action()
+        action = self._prepare_moves_action(moves)
+        if self.skipped_move_count:
+            return self._prepare_skipped_moves_notification(action)
+        return action
+
+    def _prepare_skipped_moves_notification(self, next_action):
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'warning',
+                'sticky': True,
+                'message': _(
+                    "%d journal entries of the file have been skipped because "
+                    "they have already been imported.") % self.skipped_move_count,
+                'next': next_action,
+                },
+            }
+
+    def _check_import(self):
+        # Checks of the options and of the file before its import,
+        # also done by the dry run of button_check()
+        if not self.with_context(bin_size=True).file_to_import:
             raise UserError(_("You must upload a file to import."))
-        fileobj = NamedTemporaryFile('wb+', prefix='odoo-move_import-', suffix='.xlsx')
-        file_bytes = base64.b64decode(self.file_to_import)
-        fileobj.write(file_bytes)
-        fileobj.seek(0)  # We must start reading from the beginning !
-        pivot = self.file2pivot(fileobj, file_bytes)
-        fileobj.close()
-        logger.debug('pivot before update: %s', pivot)
-        self.clean_strip_pivot(pivot)
-        self.update_pivot(pivot)
-        moves = self.create_moves_from_pivot(pivot, post=self.post_move)
-        if self.post_move:
-            self.reconcile_move_lines(moves)
+        self._check_creation_mode()
+        if self.skip_imported_moves:
+            self._check_imported_file(self._get_file_attachment())
+
+    def _check_creation_mode(self):
+        if self.creation_mode == 'sql':
+            if self.file_format != 'fec_txt':
+                raise UserError(_("The migration mode is only available for FEC files."))
+            if self.keep_odoo_move_name:
+                raise UserError(_(
+                    "The migration mode uses the journal entry numbers of the "
+                    "file: disable the option 'Don't Force Journal Entry Name'."))
+
+    def _check_imported_file(self, attachment):
+        job = self.env['account.move.import.job']._find_imported_job(
+            self.company_id.id, attachment.checksum)
+        if job:
+            raise UserError(_(
+                "This file has already been imported on %s (import '%s', "
+                "%d journal entries). Delete these journal entries or disable "
+                "the option 'Skip Already Imported Entries' to import it again.") % (
+                fields.Datetime.to_string(job.start_date or job.create_date),
+                job.name, len(job.move_ids)))
+
+    def button_check(self):
+        # Dry run: check the file as run_import does, without creating anything
+        self.ensure_one()
+        self._check_import()
+        with self._open_attachment(self._get_file_attachment()) as fileobj:
+            result = self._check_file(fileobj)
+        self.write(dict(
+            self._prepare_error_report_vals(result['error_report']),
+            check_result=self._check_result2msg(result)))
+        return self._reopen_wizard_action()
+
+    def _check_file(self, fileobj):
+        stats = ImportStats(self.env.cr)
+        stats.start()
+        totals = {}
+        with stats.stage('speeddict'):
+            speeddict = self._prepare_import_speeddict(self.company_id.id)
+        with self._open_import_files(fileobj) as files:
+            line_count, move_count, error_msg, error_report = self._validate_pivots(
+                self._get_pivots(files), speeddict, stats, totals=totals)
+        stats.stop()
+        logger.info(
+            'Journal entry import check stats: %s', json.dumps(stats.to_dict()))
+        return {
+            'error_msg': error_msg,
+            'error_report': error_report,
+            'line_count': line_count,
+            'move_count': move_count,
+            'totals': totals,
+            'stats': stats,
+            }
+
+    @api.model
+    def _prepare_error_report_vals(self, report):
+        # Also used by the import jobs, which have the same fields
+        if not report:
+            return {'error_report': False, 'error_report_filename': False}
+        header = [_('File'), _('Type'), _('Code'), _('Line'), _('Error')]
+        return {
+            'error_report': base64.b64encode(error_report2csv(report, header)),
+            'error_report_filename': _('import_errors.csv'),
+            }
+
+    def _sum_pivot_by_journal(self, pivot, totals):
+        for l in pivot:
+            total = totals.setdefault(l['journal'], {'debit': 0.0, 'credit': 0.0, 'lines': 0})
+            total['lines'] += 1
+            for field in ('debit', 'credit'):
+                # bad amounts are reported by the checks
+                if isinstance(l[field], (float, int)):
+                    total[field] += l[field]
+            yield l
+
+    def _check_result2msg(self, result):
+        digits = self.company_id.currency_id.decimal_places
+        msg = result['error_msg']
+        if msg:
+            msg = _("The file has errors, it cannot be imported.\n\n%s") % msg
+        else:
+            msg = _("The file is valid, it can be imported.")
+        msg += _("\n\nLines: %d\nJournal Entries: %d\n\nTotals per journal:\n") % (
+            result['line_count'], result['move_count'])
+        for journal, total in sorted(result['totals'].items(), key=lambda x: str(x[0])):
+            msg += _("- %s: debit %s, credit %s (%d lines)\n") % (
+                journal, '%.*f' % (digits, total['debit']),
+                '%.*f' % (digits, total['credit']), total['lines'])
+        msg += _("\nChecked in %.1f seconds.") % result['stats'].total_time
+        return msg
+
+    def _import_file(self, fileobj):
+        start_date = fields.Datetime.now()
+        stats = ImportStats(self.env.cr, profile=self._is_profiling_enabled())
+        stats.start()
+        paused = False
+        try:
+            with self._open_import_files(fileobj) as files:
+                pivots = self._get_pivots(files)
+                if len(pivots) == 1 and not pivots[0][0] and self._is_pivot_hook_inherited():
+                    # An inheriting module overrides create_moves_from_pivot():
+                    # it gets the list of the pivot lines, as before the
+                    # streaming of the file
+                    moves = self.with_context(
+                        account_move_import_stats=stats).create_moves_from_pivot(
+                        list(pivots[0][1]()), post=self.post_move)
+                else:
+                    moves = self._create_moves_from_pivots(
+                        pivots, post=self.post_move, stats=stats)
+            if self.import_job_id:
+                # with the moves created before an interruption of the job
+                moves = self.import_job_id.move_ids
+            if self.post_move:
+                with stats.stage('reconcile'):
+                    skipped = self.reconcile_move_lines(moves)
+                for reason, count in skipped.items():
+                    stats.count('reconcile_skipped_%s' % reason, count)
+        except ImportJobPaused as e:
+            # the stats of this run are saved with the chunks it has
+            # created, before the next run of the cron resumes the job
+            paused = e
+            moves = self.import_job_id.move_ids
+        finally:
+            stats.stop()
+            logger.info(
+                'Journal entry import stats: %s', json.dumps(stats.to_dict()))
+        self._save_import_stats(moves, stats, start_date)
+        if paused:
+            raise paused
+        return moves
+
+    @contextmanager
+    def _open_import_files(self, fileobj):
+        # Yield the list of (filename, file object) to import: the file
+        # itself (filename = False) or the files of a ZIP archive. They are
+        # extracted in temporary files, because the parsers need to seek.
+        if not self._is_archive(fileobj):
+            yield [(False, fileobj)]
+            return
+        with zipfile.ZipFile(fileobj) as archive, ExitStack() as stack:
+            files = []
+            for info in sorted(archive.infolist(), key=lambda info: info.filename):
+                basename = os.path.basename(info.filename)
+                if (
+                        info.is_dir() or basename.startswith('.') or
+                        info.filename.startswith('__MACOSX/')):
+                    continue
+                tmpfile = stack.enter_context(
+                    NamedTemporaryFile('wb+', prefix='odoo-move_import-'))
+                with archive.open(info) as member:
+                    shutil.copyfileobj(member, tmpfile)
+                tmpfile.seek(0)
+                files.append((info.filename, tmpfile))
+            if not files:
+                raise UserError(_("The ZIP file doesn't contain any file."))
+            logger.info('Import %d files of a ZIP archive', len(files))
+            yield files
+
+    @api.model
+    def _is_archive(self, fileobj):
+        # XLSX and ODS files are ZIP files too
+        fileobj.seek(0)
+        try:
+            if not zipfile.is_zipfile(fileobj):
+                return False
+            fileobj.seek(0)
+            with zipfile.ZipFile(fileobj) as zipf:
+                names = set(zipf.namelist())
+            return not names & SPREADSHEET_ZIP_FILES
+        except zipfile.BadZipFile:
+            return False
+        finally:
+            fileobj.seek(0)
+
+    def _get_pivots(self, files):
+        # get_pivot(start_line=0) returns a new iterator on the pivot lines
+        # of the file after start_line
+
+        def pivot_reader(fileobj):
+            def get_pivot(start_line=0):
+                fileobj.seek(0)  # We must start reading from the beginning !
+                return self._iter_pivot(fileobj, start_line)
+            return get_pivot
+
+        return [(filename, pivot_reader(fileobj)) for (filename, fileobj) in files]
+
+    def _is_pivot_hook_inherited(self):
+        return type(self).create_moves_from_pivot is not AccountMoveImport.create_moves_from_pivot
+
+    def _is_profiling_enabled(self):
+        # "False" or "0" in the system parameter must not enable profiling
+        return self.profile_import or str2bool(self.env['ir.config_parameter'].sudo().get_param(
+            'account_move_csv_import.profile', '0'), False)
+
+    def _save_import_stats(self, moves, stats, start_date):
+        vals = {
+            'stats': stats.to_dict(),
+            'profile_result': stats.profile_result,
+            }
+        if self.import_job_id:
+            # a big file is imported by several runs of the cron
+            if self.import_job_id.stats:
+                vals['stats'] = ImportStats.add_dicts(self.import_job_id.stats, vals['stats'])
+            self.import_job_id.write(vals)
+        else:
+            # Synchronous import: the job is only a summary of the import
+            vals.update(self._prepare_import_job_vals())
+            vals.update({
+                'state': 'done',
+                'start_date': start_date,
+                'end_date': fields.Datetime.now(),
+                'line_count': stats.counters.get('lines', 0),
+                'move_count': len(moves),
+                'created_line_count': stats.counters.get('lines', 0),
+                'skipped_move_count': self.skipped_move_count,
+                'move_ids': [(6, 0, moves.ids)],
+                })
+            self.env['account.move.import.job'].create(vals)
+
+    @api.model
+    def _prepare_moves_action(self, moves):
         action = self.env["ir.actions.actions"]._for_xml_id(
             "account.action_move_journal_line")
         # We need to remove from context 'search_default_posted': 1
@@ -213,90 +587,197 @@ class AccountMoveImport(models.TransientModel):
                 })
         return action
 
+    def _get_file_attachment(self):
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'file_to_import'),
+            ('res_id', '=', self.id),
+            ], limit=1)
+
+    @api.model
+    def _open_attachment(self, attachment):
+        # Return a binary file object on the attachment without loading it
+        # in memory: we read the file of the filestore when possible.
+        # Otherwise, the base64 is decoded by chunks in a temporary file.
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        fileobj = NamedTemporaryFile('wb+', prefix='odoo-move_import-')
+        file_b64 = attachment.datas or b''
+        for i in range(0, len(file_b64), BASE64_CHUNK_SIZE):
+            fileobj.write(base64.b64decode(file_b64[i:i + BASE64_CHUNK_SIZE]))
+        fileobj.seek(0)
+        return fileobj
+
+    def _get_import_option_fields(self):
+        # Fields of the wizard copied on the import job,
+        # to create the same wizard in the cron
+        exclude = (
+            'file_to_import', 'filename', 'advanced_options', 'async_import',
+            'import_job_id', 'check_result', 'error_report',
+            'error_report_filename', 'skipped_move_count')
+        return [
+            name for name, field in self._fields.items()
+            if field.store and not field.automatic and name not in exclude]
+
+    def _prepare_import_job_vals(self):
+        options = self.read(self._get_import_option_fields(), load=False)[0]
+        options.pop('id')
+        for key, value in options.items():
+            if isinstance(value, datelib):
+                options[key] = fields.Date.to_string(value)
+        return {
+            'name': self.filename or _('Journal Entries'),
+            'company_id': self.company_id.id,
+            'file_format': self.file_format,
+            'file_hash': self._get_file_attachment().checksum,
+            'import_options': options,
+            }
+
+    def _create_import_job(self):
+        ajo = self.env['account.move.import.job']
+        vals = self._prepare_import_job_vals()
+        attachment = self._get_file_attachment()
+        # When the file of a failed job is uploaded again, this job
+        # is resumed instead of importing the file from the start
+        job = ajo._find_resumable_job(vals)
+        if job:
+            logger.info('Same file as the failed import job %s: resume it', job.id)
+            attachment.unlink()
+            job.button_requeue()
+            return self._prepare_import_job_action(job)
+        job = ajo.create(vals)
+        # The file is moved from the wizard to the job, it is not copied
+        attachment.write({
+            'res_model': job._name,
+            'res_field': False,
+            'res_id': job.id,
+            'name': job.name,
+            })
+        job.attachment_id = attachment.id
+        job._trigger_cron()
+        return self._prepare_import_job_action(job)
+
+    @api.model
+    def _prepare_import_job_action(self, job):
+        action = self.env["ir.actions.actions"]._for_xml_id(
+            "account_move_csv_import.account_move_import_job_action")
+        action.update({
+            'view_mode': 'form,tree',
+            'res_id': job.id,
+            'view_id': False,
+            'views': False,
+            })
+        return action
+
+    def _iter_pivot(self, fileobj, start_line=0):
+        # The pivot lines are cleaned and updated by batches while the file
+        # is parsed, so that the full pivot is never loaded in memory.
+        # The batches go through the public methods clean_strip_pivot()
+        # and update_pivot(), which may be inherited.
+        # When an import job is resumed, the parsers start after start_line
+        # (cf _get_start_line()): the lines before it are neither parsed
+        # nor matched again.
+        pivot = self.with_context(import_start_line=start_line).file2pivot(fileobj)
+        if start_line:
+            # for the parsers of inheriting modules that read all the lines
+            pivot = (l for l in pivot if l['line'] > start_line)
+        for batch in split_every(PIVOT_BATCH_SIZE, pivot, piece_maker=list):
+            self.clean_strip_pivot(batch)
+            self.update_pivot(batch)
+            yield from batch
+
+    def _get_start_line(self):
+        # The parsers skip the rows up to this line number without
+        # converting them, cf _iter_pivot()
+        return self.env.context.get('import_start_line', 0)
+
     def clean_strip_pivot(self, pivot):
         for l in pivot:
-            for key, value in l.items():
-                if value:
-                    if isinstance(value, str):
-                        l[key] = value.strip() or False
-                else:
-                    l[key] = False
+            self._clean_strip_pivot_line(l)
+
+    def _clean_strip_pivot_line(self, l):
+        for key, value in l.items():
+            if value:
+                if isinstance(value, str):
+                    l[key] = value.strip() or False
+            else:
+                l[key] = False
 
     def update_pivot(self, pivot):
-        force_move_date = self.force_move_date
-        force_move_ref = self.force_move_ref
-        force_move_line_name = self.force_move_line_name
-        force_journal_code =\
-            self.force_journal_id and self.force_journal_id.code or False
+        forced_vals = self._prepare_pivot_forced_vals()
         for l in pivot:
-            if force_move_date:
-                l['date'] = force_move_date
-            if force_move_line_name:
-                l['name'] = force_move_line_name
-            if force_move_ref:
-                l['ref'] = force_move_ref
-            if force_journal_code:
-                l['journal'] = force_journal_code
-            if not l['credit']:
-                l['credit'] = 0.0
-            if not l['debit']:
-                l['debit'] = 0.0
+            self._update_pivot_line(l, forced_vals)
+
+    def _prepare_pivot_forced_vals(self):
+        forced_vals = {}
+        if self.force_move_date:
+            forced_vals['date'] = self.force_move_date
+        if self.force_move_line_name:
+            forced_vals['name'] = self.force_move_line_name
+        if self.force_move_ref:
+            forced_vals['ref'] = self.force_move_ref
+        if self.force_journal_id:
+            forced_vals['journal'] = self.force_journal_id.code
+        return forced_vals
+
+    def _update_pivot_line(self, l, forced_vals):
+        l.update(forced_vals)
+        if not l['credit']:
+            l['credit'] = 0.0
+        if not l['debit']:
+            l['debit'] = 0.0
 
     def extenso2pivot(self, fileobj):
         fieldnames = [
             'journal', 'date', False, 'account', False, False, False, False,
             'debit', 'credit']
-        res = []
         with open(fileobj.name, newline='', encoding='utf-8') as f:
             reader = csv.DictReader(
                 f,
                 fieldnames=fieldnames,
                 delimiter='\t',
                 quoting=csv.QUOTE_MINIMAL)
-            i = 0
+            i = self._get_start_line()
+            skip_rows(reader.reader, i)
             for l in reader:
                 i += 1
-                l['credit'] = l['credit'] or '0'
-                l['debit'] = l['debit'] or '0'
-                vals = {
-                    'journal': l['journal'],
-                    'account': l['account'],
-                    'credit': float(l['credit'].replace(',', '.')),
-                    'debit': float(l['debit'].replace(',', '.')),
-                    'date': datetime.strptime(l['date'], '%d%m%Y'),
-                    'line': i,
-                }
-                res.append(vals)
-        return res
+                vals = PivotLine(
+                    journal=l['journal'],
+                    account=l['account'],
+                    credit=parse_amount(l['credit']),
+                    debit=parse_amount(l['debit']),
+                    date=parse_date(l['date'], '%d%m%Y'),
+                    line=i,
+                )
+                yield vals
 
     def cielpaye2pivot(self, fileobj):
         fieldnames = [
             False, 'journal', 'date', 'account', False, 'amount', 'sign',
             False, 'name', False]
-        res = []
         with open(fileobj.name, newline='', encoding='utf-8') as f:
             reader = csv.DictReader(
                 f,
                 fieldnames=fieldnames,
                 delimiter='\t',
                 quoting=csv.QUOTE_MINIMAL)
-            i = 0
+            i = self._get_start_line()
+            skip_rows(reader.reader, i)
             for l in reader:
                 i += 1
                 # skip non-move lines
                 if l.get('date') and l.get('name') and l.get('amount'):
-                    amount = float(l['amount'].replace(',', '.'))
-                    vals = {
-                        'journal': l['journal'],
-                        'account': l['account'],
-                        'credit': l['sign'] == 'C' and amount or 0,
-                        'debit': l['sign'] == 'D' and amount or 0,
-                        'date': datetime.strptime(l['date'], '%d/%m/%Y'),
-                        'name': l['name'],
-                        'line': i,
-                    }
-                    res.append(vals)
-        return res
+                    amount = parse_amount(l['amount'])
+                    vals = PivotLine(
+                        journal=l['journal'],
+                        account=l['account'],
+                        credit=l['sign'] == 'C' and amount or 0,
+                        debit=l['sign'] == 'D' and amount or 0,
+                        date=parse_date(l['date'], '%d/%m/%Y'),
+                        name=l['name'],
+                        line=i,
+                    )
+                    yield vals
 
     def fectxt2pivot(self, fileobj):
         fieldnames = [
@@ -319,7 +800,6 @@ class AccountMoveImport(models.TransientModel):
             False,            # Montantdevise
             False,            # Idevise
             ]
-        res = []
         first_line = fileobj.readline().decode()
         dialect = csv.Sniffer().sniff(first_line, delimiters="|\t")
         fileobj.seek(0)
@@ -328,29 +808,27 @@ class AccountMoveImport(models.TransientModel):
                 f,
                 fieldnames=fieldnames,
                 delimiter=dialect.delimiter)
-            i = 0
+            i = self._get_start_line()
+            skip_rows(reader.reader, i)
             for l in reader:
                 i += 1
                 # Skip header line
                 if i == 1:
                     continue
-                l['credit'] = l['credit'] or '0'
-                l['debit'] = l['debit'] or '0'
-                vals = {
-                    'journal': l['journal'],
-                    'move_name': l['move_name'],
-                    'account': l['account'],
-                    'partner': l['partner_ref'],
-                    'credit': float(l['credit'].replace(',', '.')),
-                    'debit': float(l['debit'].replace(',', '.')),
-                    'date': datetime.strptime(l['date'], '%Y%m%d'),
-                    'name': l['name'],
-                    'ref': l['ref'],
-                    'reconcile_ref': l['reconcile_ref'],
-                    'line': i,
-                }
-                res.append(vals)
-        return res
+                vals = PivotLine(
+                    journal=l['journal'],
+                    move_name=l['move_name'],
+                    account=l['account'],
+                    partner=l['partner_ref'],
+                    credit=parse_amount(l['credit']),
+                    debit=parse_amount(l['debit']),
+                    date=parse_date(l['date'], '%Y%m%d'),
+                    name=l['name'],
+                    ref=l['ref'],
+                    reconcile_ref=l['reconcile_ref'],
+                    line=i,
+                )
+                yield vals
 
     def genericcsv2pivot(self, fileobj):
         # Prisme
@@ -362,7 +840,6 @@ class AccountMoveImport(models.TransientModel):
         # I use utf-8-sig instead of utf-8 to transparently handle BOM
         # https://en.wikipedia.org/wiki/Byte_order_mark
         encoding = self.file_encoding == 'utf-8' and 'utf-8-sig' or self.file_encoding
-        res = []
         with open(fileobj.name, newline='', encoding=encoding) as f:
             reader = csv.DictReader(
                 f,
@@ -370,39 +847,39 @@ class AccountMoveImport(models.TransientModel):
                 delimiter=DELIMITER[self.delimiter],
                 quotechar='"',
                 quoting=csv.QUOTE_MINIMAL)
-            i = 0
+            i = self._get_start_line()
+            skip_rows(reader.reader, i)
             for l in reader:
                 i += 1
                 if i == 1 and self.file_with_header:
                     continue
                 date_str = l['date']
                 try:
-                    date = datetime.strptime(date_str, self.date_format)
+                    date = parse_date(date_str, self.date_format)
                 except Exception:
                     raise UserError(_(
                         "Date parsing error: '%s' in line %s does not match "
                         "date format '%s'.") % (date_str, i, self.date_format))
 
-                vals = {
-                    'journal': l['journal'],
-                    'account': l['account'],
-                    'credit': float(l['credit'].replace(',', '.') or 0),
-                    'debit': float(l['debit'].replace(',', '.') or 0),
-                    'date': date,
-                    'name': l['name'],
-                    'ref': l.get('ref', ''),
-                    'reconcile_ref': l.get('reconcile_ref', ''),
-                    'line': i,
-                    }
+                vals = PivotLine(
+                    journal=l['journal'],
+                    account=l['account'],
+                    credit=parse_amount(l['credit']),
+                    debit=parse_amount(l['debit']),
+                    date=date,
+                    name=l['name'],
+                    ref=l.get('ref', ''),
+                    reconcile_ref=l.get('reconcile_ref', ''),
+                    line=i,
+                    )
                 if l['analytic']:
                     vals['analytic'] = l['analytic']
                 if l['partner']:
                     vals['partner'] = l['partner']
-                res.append(vals)
-        return res
+                yield vals
 
-    def genericxlsx_autodetect(self, fileobj, file_bytes):
-        mime_res = guess_mimetype(file_bytes)
+    def genericxlsx_autodetect(self, fileobj):
+        mime_res = self._guess_spreadsheet_mimetype(fileobj)
         if mime_res == 'application/vnd.oasis.opendocument.spreadsheet':  # ODS
             return self.genericods2pivot(fileobj)
         elif mime_res == 'application/vnd.ms-excel':  # XLS
@@ -412,118 +889,129 @@ class AccountMoveImport(models.TransientModel):
         else:
             raise UserError(_("Are you sure this file is an XLSX, XLS or ODS file?"))
 
+    def _guess_spreadsheet_mimetype(self, fileobj):
+        # Same as odoo.tools.mimetypes.guess_mimetype(), but for the file
+        # object, to avoid loading the full file in memory
+        mimetype = False
+        if fileobj.read(8) == b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1':  # OLE2
+            mimetype = 'application/vnd.ms-excel'
+        elif zipfile.is_zipfile(fileobj):
+            with zipfile.ZipFile(fileobj) as zf:
+                filenames = zf.namelist()
+                if (
+                        'mimetype' in filenames and
+                        zf.read('mimetype') ==
+                        b'application/vnd.oasis.opendocument.spreadsheet'):
+                    mimetype = 'application/vnd.oasis.opendocument.spreadsheet'
+                elif 'xl/workbook.xml' in filenames:
+                    mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        fileobj.seek(0)
+        return mimetype
+
     def genericxlsx2pivot(self, fileobj):
-        wb = openpyxl.load_workbook(fileobj.name, read_only=True)
-        sh = wb.active
-        res = []
-        i = 0
-        for row in sh.rows:
-            i += 1
-            if i == 1 and self.file_with_header:
-                continue
-            if len(row) < 8:
-                continue
-            if not [item for item in row if item.value]:
-                # skip empty line
-                continue
-            vals = {
-                'date': row[0].value,
-                'journal': row[1].value,
-                'account': str(row[2].value),
-                'partner': row[3].value or False,
-                'analytic': row[4].value or False,
-                'name': row[5].value,
-                'debit': row[6].value,
-                'credit': row[7].value,
-                'ref': len(row) > 8 and row[8].value or '',
-                'reconcile_ref': len(row) > 9 and row[9].value or '',
-                'line': i,
-                }
-            res.append(vals)
-        return res
+        # we give the file object and not the file name, because
+        # openpyxl refuses file names without an .xlsx extension
+        # In read-only mode, openpyxl reads the rows one by one
+        wb = openpyxl.load_workbook(fileobj, read_only=True)
+        try:
+            sh = wb.active
+            i = self._get_start_line()
+            for row in sh.iter_rows(min_row=i + 1, values_only=True):
+                i += 1
+                if i == 1 and self.file_with_header:
+                    continue
+                if len(row) < 8:
+                    continue
+                if not any(row):
+                    # skip empty line
+                    continue
+                date = row[0]
+                # openpyxl gives datetimes, the other parsers give dates:
+                # same dates for the fingerprints of all the formats
+                if isinstance(date, datetime):
+                    date = date.date()
+                vals = PivotLine(
+                    date=date,
+                    journal=row[1],
+                    account=str(row[2]),
+                    partner=row[3] or False,
+                    analytic=row[4] or False,
+                    name=row[5],
+                    debit=row[6],
+                    credit=row[7],
+                    ref=len(row) > 8 and row[8] or '',
+                    reconcile_ref=len(row) > 9 and row[9] or '',
+                    line=i,
+                    )
+                yield vals
+        finally:
+            wb.close()
 
     def genericxls2pivot(self, fileobj):
-        wb = xlrd.open_workbook(fileobj.name)
-        sh = wb.sheet_by_index(0)
-        res = []
-        i = 0
-        for row_int in range(sh.nrows):
-            row = sh.row(row_int)
-            i += 1
-            if i == 1 and self.file_with_header:
-                continue
-            if len(row) < 8:
-                continue
-            if not [item for item in row if item.value]:
-                # skip empty line
-                continue
-            account = row[2].value
-            if isinstance(account, float):
-                account = str(int(account))
-            elif isinstance(account, int):
-                account = str(account)
-            vals = {
-                'date': datetime(*xlrd.xldate_as_tuple(row[0].value, wb.datemode)),
-                'journal': row[1].value,
-                'account': account,
-                'partner': row[3].value or False,
-                'analytic': row[4].value or False,
-                'name': row[5].value,
-                'debit': row[6].value,
-                'credit': row[7].value,
-                'ref': len(row) > 8 and row[8].value or '',
-                'reconcile_ref': len(row) > 9 and row[9].value or '',
-                'line': i,
-                }
-            res.append(vals)
-        return res
+        # XLS sheets can't be read row by row, but with on_demand=True
+        # xlrd only loads the first sheet and not the full workbook
+        wb = xlrd.open_workbook(fileobj.name, on_demand=True)
+        try:
+            sh = wb.sheet_by_index(0)
+            # the rows are read from the start line
+            for i in range(self._get_start_line() + 1, sh.nrows + 1):
+                row = sh.row(i - 1)
+                if i == 1 and self.file_with_header:
+                    continue
+                if len(row) < 8:
+                    continue
+                if not any(item.value for item in row):
+                    # skip empty line
+                    continue
+                account = row[2].value
+                if isinstance(account, float):
+                    account = str(int(account))
+                elif isinstance(account, int):
+                    account = str(account)
+                vals = PivotLine(
+                    date=datetime(*xlrd.xldate_as_tuple(row[0].value, wb.datemode)).date(),
+                    journal=row[1].value,
+                    account=account,
+                    partner=row[3].value or False,
+                    analytic=row[4].value or False,
+                    name=row[5].value,
+                    debit=row[6].value,
+                    credit=row[7].value,
+                    ref=len(row) > 8 and row[8].value or '',
+                    reconcile_ref=len(row) > 9 and row[9].value or '',
+                    line=i,
+                    )
+                yield vals
+        finally:
+            wb.release_resources()
 
     def genericods2pivot(self, fileobj):
-        if rows is None:
-            raise UserError(_(
-                "To import ods files, you must install the rows lib from "
-                "https://github.com/turicas/rows"))
-        if rows.__version__ <= '0.4.1':
-            raise UserError(_(
-                "Python lib 'rows' 0.4.1 is buggy. "
-                "You should checkout the code from https://github.com/turicas/rows"))
-        fields_ods = OrderedDict([
-            ('date', rows.fields.DateField),
-            ('journal', rows.fields.TextField),
-            ('account', rows.fields.TextField),
-            ('partner', rows.fields.TextField),
-            ('analytic', rows.fields.TextField),
-            ('name', rows.fields.TextField),
-            ('debit', rows.fields.FloatField),
-            ('credit', rows.fields.FloatField),
-            ('ref', rows.fields.TextField),
-            ('reconcile_ref', rows.fields.TextField),
-            ])
-
-        sh = rows.import_from_ods(fileobj.name, fields=fields_ods, skip_header=False)
-
-        res = []
-        i = 0
-        for row in sh:
-            # the rows lib automatically skips empty lines
-            i += 1
-            if i == 1 and self.file_with_header:
+        start_line = self._get_start_line()
+        # the header is before the start line
+        header_skipped = not self.file_with_header or start_line
+        for i, row in iter_ods_rows(fileobj, 10, start_line):
+            # empty lines are skipped by iter_ods_rows()
+            if not header_skipped:
+                header_skipped = True
                 continue
-            vals = {
-                'date': row.date,
-                'journal': row.journal,
-                'account': row.account,
-                'partner': row.partner,
-                'analytic': row.analytic,
-                'name': row.name,
-                'debit': row.debit,
-                'credit': row.credit,
-                'ref': row.ref,
-                'reconcile_ref': row.reconcile_ref,
-                'line': i,
-                }
-            res.append(vals)
-        return res
+            # numbers are given as float, codes must be text
+            for index in (1, 2, 3, 4, 5, 8, 9):
+                if isinstance(row[index], float):
+                    row[index] = row[index].is_integer() and str(int(row[index])) or str(row[index])
+            vals = PivotLine(
+                date=row[0],
+                journal=row[1],
+                account=row[2],
+                partner=row[3],
+                analytic=row[4],
+                name=row[5],
+                debit=row[6],
+                credit=row[7],
+                ref=row[8],
+                reconcile_ref=row[9],
+                line=i,
+                )
+            yield vals
 
     def nibelis2pivot(self, fileobj):
         fieldnames = [
@@ -534,57 +1022,107 @@ class AccountMoveImport(models.TransientModel):
             'trashv', 'name',
             'trashx', 'trashy', 'trashz', 'trashaa', 'trashab',
             'trashac', 'trashad', 'trashae', 'analytic']
-        res = []
         with open(fileobj.name, newline='', encoding='latin1') as f:
             reader = csv.DictReader(
                 f,
                 fieldnames=fieldnames,
                 delimiter=';',
                 quoting=csv.QUOTE_MINIMAL)
-            i = 0
+            i = self._get_start_line()
+            skip_rows(reader.reader, i)
             for l in reader:
                 i += 1
                 if i == 1:
                     continue
-                amount = float(l['amount'].replace(',', '.'))
+                amount = parse_amount(l['amount'])
                 credit = l['sign'] == 'C' and amount or False
                 debit = l['sign'] == 'D' and amount or False
-                vals = {
-                    'journal': l['journal'],
-                    'account': l['account'],
-                    'credit': credit,
-                    'debit': debit,
-                    'date': datetime.strptime(l['date'], '%y%m%d'),
-                    'name': l['name'],
-                    'line': i,
-                }
+                vals = PivotLine(
+                    journal=l['journal'],
+                    account=l['account'],
+                    credit=credit,
+                    debit=debit,
+                    date=parse_date(l['date'], '%y%m%d'),
+                    name=l['name'],
+                    line=i,
+                )
                 if l.get('analytic'):
                     vals['analytic'] = l['analytic']
-                res.append(vals)
-        return res
+                yield vals
 
-    def quadra2pivot(self, file_bytes):
-        i = 0
-        res = []
-        file_str = file_bytes.decode(self.file_encoding)
-        for l in file_str.split('\n'):
-            i += 1
-            if len(l) < 54:
-                continue
-            if l[0] == 'M' and l[41] in ('C', 'D'):
-                amount_cents = int(l[42:55])
-                amount = amount_cents / 100.0
-                vals = {
-                    'journal': l[9:11],
-                    'account': l[1:9],
-                    'credit': l[41] == 'C' and amount or False,
-                    'debit': l[41] == 'D' and amount or False,
-                    'date': datetime.strptime(l[14:20], '%d%m%y'),
-                    'name': l[21:41],
-                    'line': i,
-                }
-                res.append(vals)
-        return res
+    def quadra2pivot(self, fileobj):
+        # Quadra ASCII export: fixed width records, one record per line.
+        # The file is read line by line as bytes and only the fields
+        # that are used are decoded. Record types:
+        # M = journal item, I = analytic distribution of the previous
+        # journal item, C = account (not used), other types are ignored.
+        # A journal item is yielded when the next record is read,
+        # because its analytic distribution is in the records after it.
+        encoding = self.file_encoding
+        single_byte = codecs.lookup(encoding).name != 'utf-8'
+
+        def field(l, start, end):
+            value = l[start:end]
+            return value.decode(encoding) if isinstance(value, bytes) else value
+
+        # the analytic records after start_line belong to a journal item
+        # that has already been imported: they are ignored
+        i = self._get_start_line()
+        vals = None
+        analytic = []
+        with open(fileobj.name, 'rb') as f:
+            skip_rows(f, i)
+            for l in f:
+                i += 1
+                l = l.rstrip(b'\r\n')
+                if not single_byte and not l.isascii():
+                    # with UTF-8, positions are in characters, not in bytes
+                    l = l.decode(encoding)
+                record_type = field(l, 0, 1)
+                if record_type == 'I' and vals is not None:
+                    self._quadra_analytic_record(l, vals, analytic, field)
+                    continue
+                if vals is not None:
+                    if analytic:
+                        vals['analytic'] = '|'.join(analytic)
+                        analytic = []
+                    yield vals
+                    vals = None
+                if record_type == 'M' and len(l) >= 54 and field(l, 41, 42) in ('C', 'D'):
+                    vals = self._quadra_move_line_record(l, i, field)
+            if vals is not None:
+                if analytic:
+                    vals['analytic'] = '|'.join(analytic)
+                yield vals
+
+    def _quadra_move_line_record(self, l, line_number, field):
+        amount_cents = int(l[42:55])
+        amount = amount_cents / 100.0
+        sign = field(l, 41, 42)
+        return PivotLine(
+            journal=field(l, 9, 11),
+            account=field(l, 1, 9),
+            credit=sign == 'C' and amount or False,
+            debit=sign == 'D' and amount or False,
+            date=parse_date(field(l, 14, 20), '%d%m%y'),
+            name=field(l, 21, 41),
+            line=line_number,
+            )
+
+    def _quadra_analytic_record(self, l, vals, analytic, field):
+        # I record: percentage with 2 decimals in [1:6], amount in cents
+        # in [6:19], analytic code in [19:29]. Empty fields are filled
+        # with spaces.
+        code = field(l, 19, 29).strip()
+        if not code:
+            return
+        pct = int(l[1:6].strip() or 0) / 100.0
+        if not pct:
+            # no percentage: it is computed from the amount
+            amount = int(l[6:19].strip() or 0) / 100.0
+            line_amount = vals['debit'] or vals['credit']
+            pct = line_amount and round(abs(amount) * 100 / line_amount, 2) or 0.0
+        analytic.append('%s:%s' % (code, pct))
 
     def payfit2pivot(self, fileobj):
         # Columns in Payfit exported CSV :
@@ -597,40 +1135,104 @@ class AccountMoveImport(models.TransientModel):
         # Credit
         # AxeLib
         # AxeReference
-        res = []
         with open(fileobj.name, newline="", encoding="utf-8") as f:
             reader = csv.DictReader(f, delimiter=";")
-            i = 0
+            i = self._get_start_line()
+            # the header line is read before the rows are skipped
+            if i and reader.fieldnames:
+                skip_rows(reader.reader, i)
             for l in reader:
                 i += 1
-                vals = {
-                    "journal": l.get("JournalCode", ""),
-                    "account": l["CompteNum"],
-                    "name": l["CompteLib"],
-                    "credit": float(l["Credit"] or 0.0),
-                    "debit": float(l["Debit"] or 0.0),
-                    "analytic": l.get("AxeReference", ""),
-                    "date": datetime.strptime(l["EcritureDate"], "%d/%m/%Y"),
-                    "line": i,
-                }
-                res.append(vals)
-        return res
+                vals = PivotLine(
+                    journal=l.get("JournalCode", ""),
+                    account=l["CompteNum"],
+                    name=l["CompteLib"],
+                    credit=parse_amount(l["Credit"]),
+                    debit=parse_amount(l["Debit"]),
+                    analytic=l.get("AxeReference", ""),
+                    date=parse_date(l["EcritureDate"], "%d/%m/%Y"),
+                    line=i,
+                )
+                yield vals
+
+    def _prepare_partner_speeddict_domain(self, company_id):
+        return [
+            '|',
+            ('company_id', '=', company_id),
+            ('company_id', '=', False),
+            ('ref', '!=', False),
+            ('parent_id', '=', False),
+            ]
 
     def _prepare_partner_speeddict(self, company_id):
+        # In the lazy mode, the partners are not all loaded: the refs
+        # of the file are given to _prepare_partner_speeddict_refs()
+        # during the import, cf _prepare_import_speeddict()
         speeddict = {}
+        if self.env.context.get('import_partner_lazy'):
+            return speeddict
         partner_sr = self.env['res.partner'].search_read(
-            [
-                '|',
-                ('company_id', '=', company_id),
-                ('company_id', '=', False),
-                ('ref', '!=', False),
-                ('parent_id', '=', False),
-            ],
-            ['ref'])
+            self._prepare_partner_speeddict_domain(company_id), ['ref'])
         for l in partner_sr:
             speeddict[l['ref'].upper()] = l['id']
         return speeddict
 
+    # The speeddicts are cached per company, because reading all the partners
+    # can take several seconds. The version of the speeddicts is stored
+    # with the cached speeddict: it is incremented when the fields used by
+    # _prepare_speeddict() are modified (cf the models/ directory), and
+    # the stale speeddict is then replaced in the same cache entry, so the
+    # cache keeps only one speeddict per company.
+    # The cached speeddicts are shared: they must never be modified.
+    def init(self):
+        self.env.cr.execute(
+            "CREATE SEQUENCE IF NOT EXISTS %s" % SPEEDDICT_VERSION_SEQUENCE)
+
+    @api.model
+    def _get_speeddict_version(self):
+        self.env.cr.execute("SELECT last_value FROM %s" % SPEEDDICT_VERSION_SEQUENCE)
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _bump_speeddict_version(self):
+        # Increment the version now, for this transaction, and again after
+        # the commit, because other workers may have cached the data of
+        # before the commit in the meantime.
+        cr = self.env.cr
+        cr.execute("SELECT nextval('%s')" % SPEEDDICT_VERSION_SEQUENCE)
+        if not cr.postcommit.data.get('account_move_import_speeddict'):
+            cr.postcommit.data['account_move_import_speeddict'] = True
+            registry = self.env.registry
+
+            def bump_after_commit():
+                with registry.cursor() as new_cr:
+                    new_cr.execute("SELECT nextval('%s')" % SPEEDDICT_VERSION_SEQUENCE)
+
+            cr.postcommit.add(bump_after_commit)
+
+    @api.model
+    @ormcache('company_id', 'partner_lazy')
+    def _get_speeddict_holder(self, company_id, partner_lazy):
+        # key 'speeddict' = (version, speeddict), cf _get_speeddict()
+        return {}
+
+    @api.model
+    def _get_speeddict(self, company_id, partner_lazy=False):
+        holder = self._get_speeddict_holder(company_id, partner_lazy)
+        version = self._get_speeddict_version()
+        cached = holder.get('speeddict')
+        if cached and cached[0] == version:
+            return cached[1]
+        logger.info(
+            'Prepare the speeddict of company ID %d (lazy partners: %s)',
+            company_id, partner_lazy)
+        # free the stale speeddict before building the new one
+        holder.pop('speeddict', None)
+        speeddict = self.sudo().with_context(
+            import_partner_lazy=partner_lazy)._prepare_speeddict(company_id)
+        holder['speeddict'] = (version, speeddict)
+        return speeddict
+
     def _prepare_speeddict(self, company_id):
         speeddict = {
             "partner": self._prepare_partner_speeddict(company_id),
@@ -645,183 +1247,857 @@ class AccountMoveImport(models.TransientModel):
             speeddict['account'][l['code'].upper()] = l['id']
         aacc_sr = self.env['account.analytic.account'].search_read(
             [('company_id', 'in', (company_id, False)), ('code', '!=', False)],
-            ['code'])
+            ['code', 'root_plan_id'], load=False)
+        speeddict['analytic_plan'] = {}
         for l in aacc_sr:
             speeddict['analytic'][l['code'].upper()] = l['id']
+            speeddict['analytic_plan'][l['id']] = l['root_plan_id']
         journal_sr = self.env['account.journal'].search_read([
             ('company_id', '=', company_id)], ['code'])
         for l in journal_sr:
             speeddict['journal'][l['code'].upper()] = l['id']
         return speeddict
 
+    def _prepare_import_speeddict(self, company_id):
+        # Speeddict of one import. Partners are not all loaded (lazy mode):
+        # the refs of the file are searched by batches of lines in
+        # _resolve_partner_refs(), unless the file has many different refs.
+        # The processes of the parallel check can't search partners.
+        partner_lazy = self.validation_processes <= 1
+        speeddict = dict(self._get_speeddict(company_id, partner_lazy))
+        # the matches of account codes and analytic strings of the file
+        # are memoized for this import only
+        speeddict['account_resolver'] = AccountCodeResolver(speeddict['account'])
+        # key = analytic string of the file, cf match_analytic()
+        speeddict['analytic_cache'] = {}
+        if partner_lazy:
+            speeddict.update({
+                # copy, because the cached speeddict is shared
+                'partner': dict(speeddict['partner']),
+                'partner_missing': set(),
+                'partner_lazy': True,
+                })
+        return speeddict
+
+    def _resolve_partner_refs(self, lines, speeddict):
+        if not speeddict.get('partner_lazy'):
+            return
+        new_refs = {l['partner'] for l in lines if l.get('partner')}
+        new_refs -= speeddict['partner'].keys()
+        new_refs -= speeddict['partner_missing']
+        if not new_refs:
+            return
+        company_id = self.company_id.id
+        ref_count = len(speeddict['partner']) + len(speeddict['partner_missing']) + len(new_refs)
+        if ref_count > PARTNER_PRELOAD_THRESHOLD:
+            logger.info(
+                'More than %d different partner refs: load all partners',
+                PARTNER_PRELOAD_THRESHOLD)
+            speeddict.update({
+                'partner': self._get_speeddict(company_id)['partner'],
+                'partner_lazy': False,
+                })
+            return
+        found = self.sudo()._prepare_partner_speeddict_refs(company_id, new_refs)
+        speeddict['partner'].update(found)
+        speeddict['partner_missing'] |= new_refs - found.keys()
+
+    def _prepare_partner_speeddict_refs(self, company_id, refs):
+        # Lazy mode: return the same result as _prepare_partner_speeddict()
+        # for these refs of the file. Inherit both methods to change
+        # the matching of the partners.
+        res = {}
+        rpo = self.env['res.partner'].sudo()
+        domain = self._prepare_partner_speeddict_domain(company_id)
+        for chunk in split_every(PARTNER_SEARCH_CHUNK_SIZE, refs, piece_maker=list):
+            for l in rpo.search_read(domain + [('ref', 'in', chunk)], ['ref']):
+                res[l['ref'].upper()] = l['id']
+            # The refs of Odoo are compared in uppercase with the refs of
+            # the file: search the refs which were not found with the same case
+            remaining = [
+                ref for ref in chunk
+                if isinstance(ref, str) and ref.upper() == ref and ref not in res]
+            if remaining:
+                ilike_domain = expression.OR([
+                    [('ref', '=ilike', escape_psql(ref))] for ref in remaining])
+                for l in rpo.search_read(domain + ilike_domain, ['ref']):
+                    if l['ref'].upper() in remaining:
+                        res[l['ref'].upper()] = l['id']
+        return res
+
     def create_moves_from_pivot(self, pivot, post=False):
-        logger.debug('Final pivot: %s', pivot)
-        amo = self.env['account.move']
+        # pivot is the list of the pivot lines of the file. run_import()
+        # only calls this method when it is inherited: otherwise the file
+        # is streamed by _create_moves_from_pivots().
+        return self.create_moves_from_pivots([(False, pivot)], post=post)
+
+    def create_moves_from_pivots(self, pivots, post=False):
+        # pivots is a list of (filename, list of pivot lines)
+
+        def pivot_reader(pivot):
+            def get_pivot(start_line=0):
+                return (l for l in pivot if l['line'] > start_line)
+            return get_pivot
+
+        return self._create_moves_from_pivots(
+            [(filename, pivot_reader(pivot)) for (filename, pivot) in pivots],
+            post=post, stats=self.env.context.get('account_move_import_stats'))
+
+    def _create_moves_from_pivots(self, pivots, post=False, stats=None):
+        # pivots is a list of (filename, get_pivot): filename is False when
+        # a single file is imported, or the name of the file in the ZIP
+        # archive, and get_pivot(start_line=0) returns a new iterator on the
+        # pivot lines of the file after start_line. The pivots are read a first
+        # time to match and check all the lines and a second time to create
+        # the moves, so that nothing is written if a file has errors.
+        # The moves of all the files are created and posted by the same chunks.
+        if stats is None:
+            stats = ImportStats(self.env.cr)
+        job = self.import_job_id
         company_id = self.company_id.id
-        speeddict = self._prepare_speeddict(company_id)
-        key2label = {
+        with stats.stage('speeddict'):
+            speeddict = self._prepare_import_speeddict(company_id)
+        if job.validated:
+            # Resume of an import job: the file has already been checked
+            line_count, move_count = job.line_count, job.move_count
+            seq = job.import_sequence
+        else:
+            # MATCHES + CHECKS
+            line_count, move_count, msg, report = self._validate_pivots(
+                pivots, speeddict, stats)
+            if msg:
+                raise ImportValidationError(msg, report)
+            seq = self.env['ir.sequence'].next_by_code('account.move.import')
+            if job:
+                job._set_validated(line_count, move_count, seq)
+            stats.count('files', len(pivots))
+            stats.count('lines', line_count)
+            stats.count('moves', move_count)
+        # CREATE MOVES
+        # An import job is resumed after the last move of its checkpoint:
+        # the files before it are not read again, and the file of the
+        # checkpoint is parsed from the next line
+        resume_file_index, resume_line = job.last_file_index, job.last_line
+        checkpoint = {
+            'file_index': resume_file_index, 'line': resume_line,
+            'skipped_moves': job.skipped_move_count,
+            # skipped moves since the previous chunk, linked to the job
+            # with the checkpoint
+            'skipped_move_ids': []}
+        # key = fingerprint, value = number of occurrences in the files
+        occurrences = {}
+
+        def prepare_moves(file_index, pivot, sequence):
+            errors = self._prepare_pivot_errors()
+            moves_lines = stats.iter('split', self._split_pivot(
+                stats.iter('match', self._match_pivot(
+                    stats.iter('parse', pivot), speeddict, errors)),
+                errors))
+            for chunk in split_every(FINGERPRINT_CHUNK_SIZE, moves_lines, piece_maker=list):
+                with stats.stage('fingerprint'):
+                    fingerprints = [self._get_move_fingerprint(move_lines) for move_lines in chunk]
+                    if resume_line:
+                        # occurrences of the fingerprints before the checkpoint
+                        new_fingerprints = set(fingerprints) - occurrences.keys()
+                        if new_fingerprints:
+                            occurrences.update(
+                                job._get_fingerprint_occurrences(new_fingerprints))
+                    fingerprints = [
+                        self._number_fingerprint(fingerprint, occurrences)
+                        for fingerprint in fingerprints]
+                    imported = {}
+                    if self.skip_imported_moves:
+                        imported = self._get_imported_fingerprints(fingerprints)
+                for move_lines, fingerprint in zip(chunk, fingerprints):
+                    checkpoint.update(file_index=file_index, line=move_lines[-1]['line'])
+                    if fingerprint in imported:
+                        stats.count('skipped_moves')
+                        checkpoint['skipped_moves'] += 1
+                        checkpoint['skipped_move_ids'].append(imported[fingerprint])
+                        continue
+                    vals = self._prepare_move_with_lines(move_lines, sequence)
+                    vals['import_fingerprint'] = fingerprint
+                    yield vals
+
+        def prepare_all_moves():
+            for file_index, (filename, get_pivot) in enumerate(pivots):
+                if file_index < resume_file_index:
+                    continue
+                start_line = file_index == resume_file_index and resume_line or 0
+                if start_line:
+                    logger.info(
+                        'Resume import job %s after line %d', job.id, start_line)
+                # Import External ID = sequence-file-line for the files
+                # of an archive, sequence-line otherwise
+                sequence = filename and '%s-%d' % (seq, file_index + 1) or seq
+                yield from prepare_moves(file_index, get_pivot(start_line), sequence)
+
+        rmoves = self._create_moves(
+            stats.iter('prepare', prepare_all_moves()), post=post, stats=stats,
+            checkpoint=checkpoint)
+        logger.info(
+            'Account moves IDs %s created via file import' % rmoves.ids)
+        if checkpoint['skipped_moves']:
+            logger.info(
+                '%d journal entries skipped because they have already been imported',
+                checkpoint['skipped_moves'])
+        self.skipped_move_count = checkpoint['skipped_moves']
+        if job:
+            job.write({
+                'skipped_move_count': checkpoint['skipped_moves'],
+                'skipped_move_ids': [(4, move_id) for move_id in checkpoint['skipped_move_ids']],
+                })
+        return rmoves
+
+    def _validate_pivots(self, pivots, speeddict, stats, totals=None):
+        # Check the files one after the other with the same speeddict.
+        # Return the number of lines and moves, the error message of all
+        # the files and the list of all the errors (error report).
+        job = self.import_job_id
+        # an import job resumes the check after its last checkpoint
+        resume = job.check_checkpoint or {}
+        resume_file_index = resume.get('file_index', 0)
+        line_count = resume.get('line_count', 0)
+        move_count = resume.get('move_count', 0)
+        error_msgs = []
+        report = []
+        file_move_names = {
+            (journal_id, move_name): filename
+            for (journal_id, move_name, filename) in resume.get('file_move_names', [])}
+        budget = ErrorBudget(self.max_errors, self.max_unknown_codes)
+        for file_index, (filename, get_pivot) in enumerate(pivots):
+            if file_index < resume_file_index:
+                continue
+            errors = self._prepare_pivot_errors()
+            move_names = {}
+            fingerprints = self.skip_imported_moves and {} or None
+            start_line = 0
+            if resume and file_index == resume_file_index:
+                logger.info(
+                    'Resume the check of import job %s after line %d',
+                    job.id, resume['line'])
+                for journal_id, move_name, line, fingerprint in resume['move_names']:
+                    move_names[(journal_id, move_name)] = line
+                    if fingerprints is not None:
+                        fingerprints[(journal_id, move_name)] = fingerprint
+                start_line = resume['line']
+            pivot = get_pivot(start_line)
+            if totals is not None:
+                pivot = self._sum_pivot_by_journal(pivot, totals)
+            checkpoint = None
+            if job:
+                checkpoint = partial(
+                    self._save_check_checkpoint, file_index, line_count, move_count,
+                    move_names, fingerprints, file_move_names, errors, error_msgs)
+            with stats.stage('check'):
+                file_line_count, file_move_count = self._validate_pivot(
+                    stats.iter('parse', pivot), speeddict, errors, stats=stats,
+                    move_names=move_names, budget=budget, fingerprints=fingerprints,
+                    checkpoint=checkpoint)
+            line_count += file_line_count
+            move_count += file_move_count
+            for (journal_id, move_name), line in move_names.items():
+                if (journal_id, move_name) in file_move_names:
+                    errors['other'].append(_(
+                        "Line %d: journal entry number '%s' is also used "
+                        "in the file '%s'.") % (
+                        line, move_name, file_move_names[(journal_id, move_name)]))
+                else:
+                    file_move_names[(journal_id, move_name)] = filename
+            msg = self._pivot_errors2msg(errors)
+            if msg:
+                if filename:
+                    msg = _("File '%s':\n%s") % (filename, msg)
+                error_msgs.append(msg)
+                report += self._pivot_errors2report(errors, filename)
+            # the budget is shared by the files of an archive: it may be
+            # exceeded during the check of the file or by its errors
+            stopped = budget.exceeded
+            budget.add_file(errors)
+            if budget.exceeded and (stopped or file_index < len(pivots) - 1):
+                # the next files are not checked either
+                error_msgs.insert(0, _(
+                    "The check was stopped after %d lines because there are "
+                    "too many errors (cf the options 'Maximum Errors' and "
+                    "'Maximum Unknown Codes'). Check the format, the "
+                    "delimiter and the date format of the file.") % line_count)
+                break
+        return line_count, move_count, '\n\n'.join(error_msgs), report
+
+    def _save_check_checkpoint(
+            self, file_index, base_line_count, base_move_count, move_names,
+            fingerprints, file_move_names, errors, error_msgs,
+            last_line, line_count, move_count):
+        # Called by _validate_pivot() after the move that ends on last_line.
+        # The checkpoint is only saved while there are no errors: a file
+        # with errors is checked again from the start.
+        if error_msgs or any(count_pivot_errors(errors)):
+            return
+        fingerprints = fingerprints or {}
+        self.import_job_id._save_check_checkpoint({
+            'file_index': file_index,
+            'line': last_line,
+            'line_count': base_line_count + line_count,
+            'move_count': base_move_count + move_count,
+            'move_names': [
+                [journal_id, move_name, line, fingerprints.get((journal_id, move_name))]
+                for (journal_id, move_name), line in move_names.items()],
+            'file_move_names': [
+                [journal_id, move_name, filename]
+                for (journal_id, move_name), filename in file_move_names.items()],
+            })
+
+    def _get_move_fingerprint(self, move_lines):
+        return move_fingerprint(move_lines, self.company_id.currency_id.decimal_places)
+
+    @api.model
+    def _number_fingerprint(self, fingerprint, occurrences):
+        # The same move can be several times in a file (same amounts every
+        # month without move name...): the occurrence number is added
+        # to the fingerprint after the first one
+        occurrences[fingerprint] = occurrences.get(fingerprint, 0) + 1
+        if occurrences[fingerprint] > 1:
+            fingerprint = '%s-%d' % (fingerprint, occurrences[fingerprint])
+        return fingerprint
+
+    def _get_imported_fingerprints(self, fingerprints):
+        # Return a dict with key = fingerprint, value = ID of an imported move
+        moves = self.env['account.move'].search_read([
+            ('import_fingerprint', 'in', fingerprints),
+            ('company_id', '=', self.company_id.id),
+            ('state', '!=', 'cancel'),
+            ], ['import_fingerprint'])
+        return {move['import_fingerprint']: move['id'] for move in moves}
+
+    def _pivot_error_key2label(self):
+        return {
             'journal': _('journal codes'),
             'account': _('account codes'),
             'partner': _('partner reference'),
             'analytic': _('analytic codes'),
             }
+
+    def _prepare_pivot_errors(self):
         errors = {'other': []}
-        for key in key2label.keys():
+        for key in self._pivot_error_key2label().keys():
             errors[key] = {}
-        # MATCHES + CHECKS
-        for l in pivot:
-            assert l.get('line') and isinstance(l.get('line'), int), \
-                'missing line number'
-            if l['account'] in speeddict['account']:
-                l['account_id'] = speeddict['account'][l['account']]
-            if not l.get('account_id'):
-                # Match when import = 61100000 and Odoo has 611000
-                acc_code_tmp = l['account']
-                while acc_code_tmp and acc_code_tmp[-1] == '0':
-                    acc_code_tmp = acc_code_tmp[:-1]
-                    if acc_code_tmp and acc_code_tmp in speeddict['account']:
-                        l['account_id'] = speeddict['account'][acc_code_tmp]
-                        break
-            if not l.get('account_id'):
-                # Match when import = 611000 and Odoo has 611000XX
-                for code, account_id in speeddict['account'].items():
-                    if code.startswith(l['account']):
-                        logger.warning(
-                            "Approximate match: import account %s has been matched "
-                            "with Odoo account %s" % (l['account'], code))
-                        l['account_id'] = account_id
-                        break
-            if not l.get('account_id'):
-                errors['account'].setdefault(l['account'], []).append(l['line'])
-            if l.get('partner'):
-                if l['partner'] in speeddict['partner']:
-                    l['partner_id'] = speeddict['partner'][l['partner']]
-                else:
-                    errors['partner'].setdefault(l['partner'], []).append(l['line'])
-            if l.get('analytic'):
-                l['analytic_distribution'] = {}
-                for ana_entry in l['analytic'].split('|'):
-                    ana_entry = ana_entry.strip()
-                    if ana_entry:
-                        ana_entry_split = ana_entry.split(':')
-                        if len(ana_entry_split) == 1:
-                            ana_account_code = ana_entry_split[0].strip()
-                            ana_pct = 100
-                        elif len(ana_entry_split) > 1:
-                            ana_account_code = ':'.join(ana_entry_split[:-1]).strip()
-                            ana_pct_str = ana_entry_split[-1]
-                            ana_pct_str_ready = ana_pct_str.replace(',', '.')
-                            try:
-                                ana_pct = float(ana_pct_str_ready)
-                            except Exception:
-                                errors['other'].append("Line %d: wrong analytic percentage: '%s' is not a number." % (l['line'], ana_pct_str))
-                                ana_pct = 1
-                            if ana_pct < 0 or ana_pct > 100:
-                                errors['other'].append("Line %d: wrong analytic percentage: '%s' is not between 0 and 100." % (l['line'], ana_pct_str))
-                        if ana_account_code in speeddict['analytic']:
-                            l['analytic_distribution'][speeddict['analytic'][ana_account_code]] = ana_pct
-                        else:
-                            errors['analytic'].setdefault(ana_account_code, []).append(l['line'])
-
-            if l['journal'] in speeddict['journal']:
-                l['journal_id'] = speeddict['journal'][l['journal']]
-            else:
-                errors['journal'].setdefault(l['journal'], []).append(l['line'])
-            if not l.get('date'):
-                errors['other'].append(_(
-                    'Line %d: missing date.') % l['line'])
-            else:
-                if not isinstance(l.get('date'), datelib):
-                    try:
-                        l['date'] = datetime.strptime(l['date'], '%Y-%m-%d')
-                    except Exception:
-                        errors['other'].append(_(
-                            'Line %d: bad date format %s') % (l['line'], l['date']))
-            if not isinstance(l.get('credit'), (float, int)):
-                errors['other'].append(_(
-                    'Line %d: bad value for credit (%s).')
-                    % (l['line'], l['credit']))
-            if not isinstance(l.get('debit'), (float, int)):
-                errors['other'].append(_(
-                    'Line %d: bad value for debit (%s).')
-                    % (l['line'], l['debit']))
-            # test that they don't have both a value
-        # LIST OF ERRORS
+        return errors
+
+    def _pivot_errors2msg(self, errors):
+        # Only a sample of the errors of each category is in the message,
+        # all the errors are in the error report
         msg = ''
-        for key, label in key2label.items():
+        for key, label in self._pivot_error_key2label().items():
             if errors[key]:
+                code_msgs = []
+                for code, lines in list(errors[key].items())[:ERROR_SAMPLE_CODES]:
+                    lines_msg = ', '.join([str(i) for i in lines[:ERROR_SAMPLE_LINES]])
+                    if len(lines) > ERROR_SAMPLE_LINES:
+                        lines_msg += _('... (%d lines)') % len(lines)
+                    code_msgs.append('- %s : line(s) %s' % (code, lines_msg))
+                if len(errors[key]) > ERROR_SAMPLE_CODES:
+                    code_msgs.append(_('- ... and %d other codes') % (
+                        len(errors[key]) - ERROR_SAMPLE_CODES))
                 msg += _("List of %s that don't exist in Odoo:\n%s\n\n") % (
-                    label,
-                    '\n'.join([
-                        '- %s : line(s) %s' % (code, ', '.join([str(i) for i in lines]))
-                        for (code, lines) in errors[key].items()]))
+                    label, '\n'.join(code_msgs))
         if errors['other']:
-            msg += _('List of misc errors:\n%s') % (
-                '\n'.join(['- %s' % e for e in errors['other']]))
-        if msg:
-            raise UserError(msg)
-        # EXTRACT MOVES
-        skip_null_lines = self.skip_null_lines
-        split_move_method = self.split_move_method
-        moves = []
-        cur_journal_id = False
-        cur_move_name = False
-        cur_date = False
-        cur_balance = 0.0
-        comp_cur = self.company_id.currency_id
-        seq = self.env['ir.sequence'].next_by_code('account.move.import')
-        cur_move = {}
-        for l in pivot:
-            if (
-                    skip_null_lines and
-                    comp_cur.is_zero(l['credit']) and
-                    comp_cur.is_zero(l['debit'])):
-                logger.info('Skip line %d which has debit=credit=0', l['line'])
-                continue
-            move_name = l.get('move_name')
-            if split_move_method == 'move_name':
-                if not move_name:
-                    errors['other'].append(_(
-                        'Line %d: missing journal entry number.') % l['line'])
-                same_move = [cur_move_name == move_name]
-            elif split_move_method == 'balanced':
-                same_move = [
-                    cur_journal_id == l['journal_id'],
-                    not comp_cur.is_zero(cur_balance)]
-                if not self.date_by_move_line:
-                    same_move.append(cur_date == l['date'])
+            other_msgs = ['- %s' % e for e in errors['other'][:ERROR_SAMPLE_OTHER]]
+            if len(errors['other']) > ERROR_SAMPLE_OTHER:
+                other_msgs.append(_('- ... and %d other errors') % (
+                    len(errors['other']) - ERROR_SAMPLE_OTHER))
+            msg += _('List of misc errors:\n%s') % '\n'.join(other_msgs)
+        return msg
+
+    def _pivot_errors2report(self, errors, filename=False):
+        # Rows of the CSV error report: file, type, code, line, error
+        report = []
+        for key, label in self._pivot_error_key2label().items():
+            for code, lines in errors[key].items():
+                for line in lines:
+                    report.append((filename or '', label, code, line, ''))
+        other_label = _('misc errors')
+        for error in errors['other']:
+            report.append((filename or '', other_label, '', '', error))
+        return report
+
+    def _pivot_error_messages(self):
+        return {
+            'missing_date': _('Line %d: missing date.'),
+            'bad_date': _('Line %d: bad date format %s'),
+            'bad_credit': _('Line %d: bad value for credit (%s).'),
+            'bad_debit': _('Line %d: bad value for debit (%s).'),
+            'analytic_pct_nan': _(
+                "Line %d: wrong analytic percentage: '%s' is not a number."),
+            'analytic_pct_range': _(
+                "Line %d: wrong analytic percentage: '%s' is not between 0 and 100."),
+            'analytic_pct_sum': _(
+                "Line %d: wrong analytic distribution '%s': the percentages "
+                "of an analytic plan sum to %s, more than 100."),
+            'missing_move_name': _('Line %d: missing journal entry number.'),
+            'one_line_move': _('Line %d: journal entry only has 1 line.'),
+            'duplicate_move_name': _(
+                "Line %d: journal entry number '%s' is already used by "
+                "the journal entry that starts on line %d."),
+            'unbalanced_move': _(
+                "Line %d: the journal entry that starts on this line is "
+                "not balanced (balance is %s)."),
+            }
+
+    def _match_pivot(self, pivot, speeddict, errors):
+        messages = self._pivot_error_messages()
+        # Lines are matched by batches, to search all the new partner refs
+        # of a batch in one query
+        for lines in split_every(MATCH_CHUNK_SIZE, pivot, piece_maker=list):
+            self._resolve_partner_refs(lines, speeddict)
+            for l in lines:
+                self._match_pivot_line(l, speeddict, errors, messages)
+                yield l
+
+    def _match_pivot_line(self, l, speeddict, errors, messages):
+        match_pivot_line(l, speeddict, errors, messages)
+
+    def _prepare_split_options(self):
+        if self.split_move_method not in ('balanced', 'move_name'):
+            raise UserError(_("Wrong Move Split Method."))
+        return {
+            'skip_null_lines': self.skip_null_lines,
+            'split_move_method': self.split_move_method,
+            'date_by_move_line': self.date_by_move_line,
+            'rounding': self.company_id.currency_id.rounding,
+            # move_name is only written when keep_odoo_move_name is off
+            'check_move_names': not self.keep_odoo_move_name,
+            # the fingerprints of the moves with a number are compared with
+            # the ones of the existing moves, cf _check_existing_move_names()
+            'fingerprint_digits': (
+                self.company_id.currency_id.decimal_places
+                if self.skip_imported_moves else None),
+            }
+
+    def _split_pivot(self, pivot, errors):
+        # Generator that yields the list of the pivot lines of each move
+        return split_pivot(
+            pivot, errors, self._prepare_split_options(),
+            self._pivot_error_messages())
+
+    def _validate_pivot(
+            self, pivot, speeddict, errors, stats=None, move_names=None, budget=None,
+            fingerprints=None, checkpoint=None):
+        # Check all the lines and return the number of lines and moves.
+        # The journal entry numbers of the file are collected in move_names,
+        # and their fingerprints in fingerprints when the imported moves
+        # are skipped. The check stops when the error budget is exceeded.
+        # checkpoint(last_line, line_count, move_count) is called every
+        # CHECK_CHECKPOINT_INTERVAL lines, after the last line of a move.
+        if stats is None:
+            stats = ImportStats(self.env.cr)
+        if move_names is None:
+            move_names = {}
+        if budget is None:
+            budget = ErrorBudget()
+        if fingerprints is None and self.skip_imported_moves:
+            fingerprints = {}
+        if self.validation_processes > 1:
+            line_count, move_count = self._validate_pivot_parallel(
+                pivot, speeddict, errors, move_names, budget=budget,
+                fingerprints=fingerprints, checkpoint=checkpoint)
+        else:
+            check_move_names = not self.keep_odoo_move_name
+            digits = self.company_id.currency_id.decimal_places
+            messages = self._pivot_error_messages()
+            line_count = move_count = 0
+            next_checkpoint = CHECK_CHECKPOINT_INTERVAL
+            pivot = stats.iter('match', self._match_pivot(pivot, speeddict, errors))
+            if budget:
+                pivot = self._check_error_budget(pivot, errors, budget)
+            try:
+                for move_lines in stats.iter('split', self._split_pivot(pivot, errors)):
+                    move_count += 1
+                    line_count += len(move_lines)
+                    if check_move_names:
+                        collect_move_name(
+                            move_lines, move_names, errors, messages,
+                            fingerprints, digits)
+                    if checkpoint and line_count >= next_checkpoint:
+                        checkpoint(move_lines[-1]['line'], line_count, move_count)
+                        next_checkpoint = line_count + CHECK_CHECKPOINT_INTERVAL
+            except ErrorBudgetExceeded as e:
+                return e.line_count, move_count
+        if budget.exceeded:
+            return line_count, move_count
+        with stats.stage('move_names'):
+            self._check_existing_move_names(move_names, errors, fingerprints)
+        return line_count, move_count
+
+    @api.model
+    def _check_error_budget(self, pivot, errors, budget):
+        # The budget is checked on the matched lines and not on the moves:
+        # with wrong amounts, the balanced split doesn't find any move
+        for i, l in enumerate(pivot):
+            if i and not i % ERROR_BUDGET_CHECK_INTERVAL and budget.check(errors):
+                raise ErrorBudgetExceeded(i)
+            yield l
+
+    def _check_existing_move_names(self, move_names, errors, fingerprints=None):
+        # Search all the journal entry numbers of the file in a few queries,
+        # instead of getting the errors of the unicity constraint
+        # one journal entry at a time when they are posted.
+        # fingerprints is the dict of the fingerprints of the moves of the
+        # file with a number, when the imported moves are skipped.
+        if fingerprints is None:
+            fingerprints = {}
+        if not move_names:
+            return
+        names = list({move_name for (journal_id, move_name) in move_names})
+        journal_ids = list({journal_id for (journal_id, move_name) in move_names if journal_id})
+        journal_id2name = {
+            journal['id']: journal['display_name'] for journal in
+            self.env['account.journal'].search_read(
+                [('id', 'in', journal_ids)], ['display_name'])}
+        msg = _("Line %d: journal entry number '%s' already exists in journal '%s'.")
+        for names_chunk in split_every(MOVE_NAME_SEARCH_CHUNK_SIZE, names, piece_maker=list):
+            for move in self.env['account.move'].search_read([
+                    ('name', 'in', names_chunk),
+                    ('journal_id', 'in', journal_ids),
+                    ('state', '=', 'posted'),
+                    ], ['name', 'journal_id', 'import_fingerprint'], load=False):
+                key = (move['journal_id'], move['name'])
+                # an imported move may be in the file again: it will be
+                # skipped because its fingerprint is the same
+                if (
+                        move['import_fingerprint'] and
+                        move['import_fingerprint'] == fingerprints.get(key)):
+                    continue
+                line = move_names.get(key)
+                if line:
+                    errors['other'].append(msg % (
+                        line, move['name'], journal_id2name[move['journal_id']]))
+
+    def _validate_pivot_parallel(
+            self, pivot, speeddict, errors, move_names, budget=None, fingerprints=None,
+            checkpoint=None):
+        # The parsing is done by this process, which sends chunks of moves
+        # to a pool of processes that match and check the lines.
+        # The processes are forked: they get a copy of the speeddict
+        # and they never use the ORM nor the database cursor. It means that
+        # inherited _match_pivot_line() and _split_pivot() are not used.
+        processes = self.validation_processes
+        options = self._prepare_split_options()
+        logger.info('Start to check the file with %d processes', processes)
+        line_count = move_count = 0
+        next_checkpoint = CHECK_CHECKPOINT_INTERVAL
+        # (last line of the chunk, result of its check)
+        pending = deque()
+
+        messages = self._pivot_error_messages()
+
+        def merge(last_line, result):
+            nonlocal line_count, move_count, next_checkpoint
+            (chunk_errors, chunk_line_count, chunk_move_count, chunk_move_names,
+             chunk_fingerprints) = result.get()
+            merge_pivot_errors(errors, chunk_errors)
+            merge_move_names(
+                move_names, chunk_move_names, errors, messages,
+                fingerprints, chunk_fingerprints)
+            line_count += chunk_line_count
+            move_count += chunk_move_count
+            # the chunks end with the last line of a move
+            if checkpoint and line_count >= next_checkpoint:
+                checkpoint(last_line, line_count, move_count)
+                next_checkpoint = line_count + CHECK_CHECKPOINT_INTERVAL
+
+        mp_context = multiprocessing.get_context('fork')
+        with mp_context.Pool(
+                processes, initializer=init_validation_worker,
+                initargs=(
+                    speeddict, options, messages,
+                    self._prepare_pivot_errors())) as pool:
+            for chunk in iter_pivot_chunks(
+                    pivot, options, VALIDATION_CHUNK_SIZE, speeddict['journal']):
+                pending.append((
+                    chunk[-1]['line'], pool.apply_async(validate_pivot_chunk, (chunk,))))
+                # Don't read the file faster than it is checked
+                if len(pending) >= 2 * processes:
+                    merge(*pending.popleft())
+                    if budget and budget.check(errors):
+                        # the pool is terminated with the pending chunks
+                        return line_count, move_count
+            while pending:
+                merge(*pending.popleft())
+        return line_count, move_count
+
+    def _prepare_move_with_lines(self, move_lines, sequence):
+        vals = self._prepare_move(move_lines[0])
+        vals['line_ids'] = [
+            (0, 0, self._prepare_move_line(l, sequence)) for l in move_lines]
+        return vals
+
+    def _create_moves(self, moves, post=False, stats=None, checkpoint=None):
+        # Moves are posted by chunk, so that the import job can commit
+        # complete chunks. checkpoint is the position (file_index and line)
+        # of the last pivot line of the moves read from the generator.
+        if stats is None:
+            stats = ImportStats(self.env.cr)
+        amo = self.env['account.move'].with_context(**self._get_creation_context())
+        rmoves_ids = []
+        sql_mode = self.creation_mode == 'sql'
+        # in the high volume mode, the stored fields are only
+        # computed and flushed once per chunk
+        flush_after_create = self.creation_mode != 'orm_fast' or not post
+        if sql_mode:
+            sql_defaults = self._prepare_sql_defaults()
+        # maximum number of chunks of a run of the cron, cf _cron_run_import_jobs()
+        max_chunks = self.import_job_id and self.env.context.get('import_job_max_chunks')
+        for chunk_index, chunk in enumerate(
+                split_every(self.create_chunk_size, moves, piece_maker=list)):
+            if max_chunks and chunk_index >= max_chunks:
+                # this chunk is created by the next run, after the checkpoint
+                # of the previous chunk
+                raise ImportJobPaused()
+            start = time.perf_counter()
+            if sql_mode:
+                # the moves are inserted directly in the posted state
+                with stats.stage('create'):
+                    chunk_moves = self._create_moves_sql(chunk, post, sql_defaults)
+                # before the chunk is committed by the import job
+                with stats.stage('sql_check'):
+                    if not rmoves_ids:
+                        self._check_sql_move_with_orm(chunk[0], chunk_moves[0], post)
+                    totals = {}
+                    self._sum_moves_by_journal(chunk, totals)
+                    self._check_sql_moves_totals(chunk_moves.ids, totals)
             else:
-                raise UserError(_("Wrong Move Split Method."))
-            if all(same_move):  # append to current move
-                cur_move['line_ids'].append((0, 0, self._prepare_move_line(l, seq)))
-            else:  # new move
-                if cur_move:
-                    if len(cur_move['line_ids']) <= 1:
-                        raise UserError(_(
-                            "Journal entry on line %d only has 1 line.\n\n"
-                            "Debug data: %s") % (l['line'], cur_move['line_ids']))
-                    moves.append(cur_move)
-                cur_move = self._prepare_move(l)
-                cur_move['line_ids'] = [(0, 0, self._prepare_move_line(l, seq))]
-                cur_date = l['date']
-                cur_move_name = move_name
-                cur_journal_id = l['journal_id']
-                cur_balance = 0.0
-            cur_balance += l['credit'] - l['debit']
-        if cur_move:
-            moves.append(cur_move)
-        if not comp_cur.is_zero(cur_balance):
+                with stats.stage('create'):
+                    chunk_moves = amo.create(chunk)
+                    # flush here, so that the stored computed fields are counted
+                    # in this stage and not in the next one
+                    if flush_after_create:
+                        self.env.flush_all()
+                if post:
+                    with stats.stage('post'):
+                        chunk_moves.action_post()
+                        self.env.flush_all()
+            rmoves_ids += chunk_moves.ids
+            stats.count('created_moves', len(chunk))
+            duration = time.perf_counter() - start
+            logger.info(
+                'Created %d journal entries in %.2f seconds (%.1f moves/sec), '
+                '%d created so far',
+                len(chunk), duration, len(chunk) / (duration or 1e-6), len(rmoves_ids))
+            if self.import_job_id:
+                self.import_job_id._chunk_created(
+                    chunk_moves, sum(len(move['line_ids']) for move in chunk),
+                    checkpoint or {})
+        return amo.browse(rmoves_ids)
+
+    def _get_creation_context(self):
+        if self.creation_mode == 'orm_fast':
+            # The balance of the moves has already been checked by the
+            # import, and nobody reads the chatter of 100 000s of moves
+            return {
+                'tracking_disable': True,
+                'mail_create_nolog': True,
+                'mail_create_nosubscribe': True,
+                'mail_notrack': True,
+                'check_move_validity': False,
+                }
+        return {}
+
+    def _prepare_sql_defaults(self):
+        # Default values of the fields that are neither computed nor given
+        # by the file, that the ORM would set on create()
+        res = {}
+        for model_name in ('account.move', 'account.move.line'):
+            model = self.env[model_name]
+            fnames = [
+                name for name, field in model._fields.items()
+                if field.store and field.column_type and not field.compute and
+                name not in models.MAGIC_COLUMNS]
+            res[model_name] = {
+                name: value for name, value in model.default_get(fnames).items()
+                if value is not False and value is not None}
+        return res
+
+    def _create_moves_sql(self, moves_vals, post, defaults):
+        # Migration mode: insert the moves and their lines with multi-row
+        # INSERT queries, then let the ORM compute their stored computed
+        # fields for all the moves of the chunk at once. Like with create(),
+        # the fields whose value is given are not computed.
+        amo = self.env['account.move']
+        aml = self.env['account.move.line']
+        company = self.company_id
+        state = post and 'posted' or 'draft'
+        move_given_fields = {'state', 'move_type', 'posted_before'}
+        line_given_fields = {'move_id', 'balance', 'debit', 'credit'}
+        move_rows = []
+        for vals in moves_vals:
+            if not vals.get('name'):
+                raise UserError(_(
+                    "The migration mode needs the journal entry numbers of the file."))
+            row = dict(
+                defaults['account.move'], company_id=company.id,
+                currency_id=company.currency_id.id, move_type='entry',
+                state=state, posted_before=post)
+            for key, value in vals.items():
+                if key != 'line_ids':
+                    row[key] = value
+                    move_given_fields.add(key)
+            move_rows.append(row)
+        move_ids = self._sql_insert(amo, move_rows)
+        # The fields that are computed later get a temporary value,
+        # because some of them are required
+        line_rows = []
+        for move_id, vals in zip(move_ids, moves_vals):
+            for line_vals in (command[2] for command in vals['line_ids']):
+                balance = line_vals['debit'] - line_vals['credit']
+                row = dict(
+                    defaults['account.move.line'], move_id=move_id,
+                    journal_id=vals['journal_id'], company_id=company.id,
+                    company_currency_id=company.currency_id.id,
+                    currency_id=company.currency_id.id, date=vals['date'],
+                    move_name=vals['name'], ref=vals.get('ref'),
+                    parent_state=state, display_type='product',
+                    balance=balance, amount_currency=balance)
+                row.update(line_vals)
+                line_given_fields.update(line_vals)
+                line_rows.append(row)
+        line_ids = []
+        for rows in split_every(SQL_INSERT_CHUNK_SIZE, line_rows, piece_maker=list):
+            line_ids += self._sql_insert(aml, rows)
+        moves = amo.browse(move_ids)
+        lines = aml.browse(line_ids)
+        self._sql_add_to_compute(moves, move_given_fields)
+        self._sql_add_to_compute(lines, line_given_fields)
+        self.env.flush_all()
+        if post:
+            lines.filtered('analytic_distribution')._create_analytic_lines()
+            self.env.flush_all()
+        return moves
+
+    @api.model
+    def _sql_insert(self, model, rows):
+        # Return the IDs of the new records, in the order of rows
+        columns = sorted(set().union(*rows))
+        now = fields.Datetime.now()
+        values = [
+            tuple(
+                model._fields[name].convert_to_column(row.get(name), model)
+                for name in columns) + (self.env.uid, now, self.env.uid, now)
+            for row in rows]
+        query = 'INSERT INTO "%s" (%s, create_uid, create_date, write_uid, write_date) ' \
+            'VALUES %s RETURNING id' % (
+                model._table, ', '.join('"%s"' % name for name in columns),
+                ', '.join(['%s'] * len(rows)))
+        self.env.cr.execute(query, values)
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _sql_add_to_compute(self, records, given_fields):
+        for name, field in records._fields.items():
+            if field.store and field.compute and name not in given_fields:
+                self.env.add_to_compute(field, records)
+
+    @api.model
+    def _sum_moves_by_journal(self, moves_vals, totals):
+        for vals in moves_vals:
+            total = totals.setdefault(
+                vals['journal_id'], {'debit': 0.0, 'credit': 0.0, 'lines': 0})
+            for command in vals['line_ids']:
+                total['debit'] += command[2]['debit']
+                total['credit'] += command[2]['credit']
+                total['lines'] += 1
+
+    def _check_sql_move_with_orm(self, vals, sql_move, post):
+        # Create the same move with the ORM in a savepoint that is rolled
+        # back, and compare the stored fields of both moves and their lines
+        sql_values = self._get_move_check_values(sql_move)
+        orm_vals = copy.deepcopy(vals)
+        orm_vals['name'] = 'CHECK/%s' % vals['name']
+        with self.env.cr.savepoint() as savepoint:
+            orm_move = self.env['account.move'].create(orm_vals)
+            if post:
+                orm_move.action_post()
+            self.env.flush_all()
+            orm_values = self._get_move_check_values(orm_move)
+            savepoint.rollback()
+        self.env.invalidate_all()
+        diffs = []
+        for (label, sql_record_values), (label, orm_record_values) in zip(
+                sql_values, orm_values):
+            for name, value in sql_record_values.items():
+                if value != orm_record_values.get(name):
+                    diffs.append(_("- %s, field '%s': %r (migration) / %r (standard)") % (
+                        label, name, value, orm_record_values.get(name)))
+        if len(sql_values) != len(orm_values):
+            diffs.append(_("- number of journal items: %d (migration) / %d (standard)") % (
+                len(sql_values) - 1, len(orm_values) - 1))
+        if diffs:
             raise UserError(_(
-                "The journal entry that ends on the last line is not "
-                "balanced (balance is %s).") % cur_balance)
-        rmoves = self.env['account.move']
-        for move in moves:
-            rmoves += amo.create(move)
+                "The journal entry %s inserted by the migration mode is different "
+                "from the journal entry created in the standard way:\n%s\n\n"
+                "Use the standard creation mode.") % (vals['name'], '\n'.join(diffs[:20])))
+        logger.info('Migration mode checked on journal entry %s', vals['name'])
+
+    @api.model
+    def _get_move_check_values(self, move):
+        # List of (label, stored values) of the move and its lines,
+        # to compare the moves created by different creation modes
+        res = []
+        for records in [move, move.line_ids.sorted('id')]:
+            fnames = [
+                name for name, field in records._fields.items()
+                if field.store and field.type != 'one2many' and
+                name not in MOVE_CHECK_IGNORED_FIELDS]
+            for i, values in enumerate(records.read(fnames, load=False)):
+                values.pop('id')
+                if records._name == 'account.move.line':
+                    label = _('journal item %d') % (i + 1)
+                    values['analytic_amounts'] = sorted(
+                        records[i].analytic_line_ids.mapped('amount'))
+                else:
+                    label = _('journal entry')
+                res.append((label, values))
+        return res
+
+    def _check_sql_moves_totals(self, move_ids, totals):
+        # Compare the totals of the lines of the file with the totals
+        # of the inserted lines, and check that all the moves are balanced
+        digits = self.company_id.currency_id.decimal_places
+        cr = self.env.cr
+        errors = []
+        cr.execute("""
+            SELECT journal_id, SUM(debit), SUM(credit), COUNT(*)
+            FROM account_move_line WHERE move_id = ANY(%s)
+            GROUP BY journal_id""", (move_ids,))
+        db_totals = {
+            journal_id: {'debit': float(debit), 'credit': float(credit), 'lines': count}
+            for (journal_id, debit, credit, count) in cr.fetchall()}
+        for journal_id, total in totals.items():
+            db_total = db_totals.get(journal_id, {'debit': 0.0, 'credit': 0.0, 'lines': 0})
+            if (
+                    total['lines'] != db_total['lines'] or
+                    float_compare(total['debit'], db_total['debit'], precision_digits=digits) or
+                    float_compare(total['credit'], db_total['credit'], precision_digits=digits)):
+                errors.append(_(
+                    "- journal ID %d: debit %s, credit %s, %d lines in the file / "
+                    "debit %s, credit %s, %d lines in the database") % (
+                    journal_id, total['debit'], total['credit'], total['lines'],
+                    db_total['debit'], db_total['credit'], db_total['lines']))
+        cr.execute("""
+            SELECT move.name
+            FROM account_move_line line
+            JOIN account_move move ON move.id = line.move_id
+            WHERE line.move_id = ANY(%s)
+            GROUP BY move.id, move.name
+            HAVING ROUND(SUM(line.balance), %s) != 0
+            LIMIT 10""", (move_ids, digits))
+        for (move_name, ) in cr.fetchall():
+            errors.append(_("- journal entry %s is not balanced") % move_name)
+        if errors:
+            raise UserError(_(
+                "The journal entries inserted by the migration mode are not "
+                "consistent with the file:\n%s") % '\n'.join(errors))
         logger.info(
-            'Account moves IDs %s created via file import' % rmoves.ids)
-        if post:
-            rmoves.action_post()
-        return rmoves
+            'Migration mode: totals of %d journal entries checked', len(move_ids))
 
     def _prepare_move(self, pivot_line):
         vals = {
@@ -840,61 +2116,81 @@ class AccountMoveImport(models.TransientModel):
             'name': pivot_line['name'],
             'partner_id': pivot_line.get('partner_id'),
             'account_id': pivot_line['account_id'],
-            'analytic_distribution': pivot_line.get('analytic_distribution'),
+            # copy, because the distribution is shared by several pivot lines
+            'analytic_distribution': pivot_line.get('analytic_distribution') and dict(
+                pivot_line['analytic_distribution']),
             'import_reconcile': pivot_line.get('reconcile_ref'),
             'import_external_id': '%s-%s' % (sequence, pivot_line.get('line')),
             }
         return vals
 
     def reconcile_move_lines(self, moves):
+        # Return the number of skipped reconcile refs per reason
         comp_cur = self.company_id.currency_id
+        amlo = self.env['account.move.line']
         logger.info('Start to reconcile imported moves')
-        lines = self.env['account.move.line'].search([
+        torec = {}  # key = reconcile mark, value = list of move line data
+        lines = amlo.search_read([
             ('move_id', 'in', moves.ids),
             ('import_reconcile', '!=', False),
-            ])
-        torec = {}  # key = reconcile mark, value = movelines_recordset
+            ], ['import_reconcile', 'account_id', 'partner_id', 'credit', 'debit'],
+            load=False)
         for line in lines:
-            if line.import_reconcile in torec:
-                torec[line.import_reconcile] |= line
-            else:
-                torec[line.import_reconcile] = line
+            torec.setdefault(line['import_reconcile'], []).append(line)
+        account_ids = {line['account_id'] for line in lines}
+        reconcile_accounts = {
+            acc['id']: acc for acc in self.env['account.account'].search_read(
+                [('id', 'in', list(account_ids))], ['code', 'reconcile'])}
+        skipped = dict.fromkeys(
+            ['single_line', 'unbalanced', 'accounts', 'not_reconcilable', 'partners'], 0)
+        plan = []
         for rec_ref, lines_to_rec in torec.items():
             if len(lines_to_rec) < 2:
                 logger.warning(
                     "Skip reconcile of ref '%s' because "
                     "this ref is only on 1 move line", rec_ref)
+                skipped['single_line'] += 1
                 continue
             total = 0.0
-            accounts = {}
-            partners = {}
+            accounts = set()
+            partners = set()
             for line in lines_to_rec:
-                total += line.credit
-                total -= line.debit
-                accounts[line.account_id] = True
-                partners[line.partner_id.id or False] = True
+                total += line['credit']
+                total -= line['debit']
+                accounts.add(line['account_id'])
+                partners.add(line['partner_id'] or False)
             if not comp_cur.is_zero(total):
                 logger.warning(
                     "Skip reconcile of ref '%s' because the lines with "
                     "this ref are not balanced (%s)", rec_ref, total)
+                skipped['unbalanced'] += 1
                 continue
             if len(accounts) > 1:
                 logger.warning(
                     "Skip reconcile of ref '%s' because the lines with "
                     "this ref have different accounts (%s)",
-                    rec_ref, ', '.join([acc.code for acc in accounts.keys()]))
+                    rec_ref, ', '.join([reconcile_accounts[acc_id]['code'] for acc_id in accounts]))
+                skipped['accounts'] += 1
                 continue
-            if not list(accounts)[0].reconcile:
+            account = reconcile_accounts[accounts.pop()]
+            if not account['reconcile']:
                 logger.warning(
                     "Skip reconcile of ref '%s' because the account '%s' "
                     "is not configured with 'Allow Reconciliation'",
-                    rec_ref, list(accounts)[0].display_name)
+                    rec_ref, account['code'])
+                skipped['not_reconcilable'] += 1
                 continue
             if len(partners) > 1:
                 logger.warning(
                     "Skip reconcile of ref '%s' because the lines with "
                     "this ref have different partners (IDs %s)",
-                    rec_ref, ', '.join(partners.keys()))
+                    rec_ref, ', '.join([str(partner_id) for partner_id in partners]))
+                skipped['partners'] += 1
                 continue
-            lines_to_rec.reconcile()
-        logger.info('Reconcile imported moves finished')
+            plan.append([line['id'] for line in lines_to_rec])
+        for chunk in split_every(RECONCILE_CHUNK_SIZE, plan):
+            amlo._reconcile_plan([amlo.browse(line_ids) for line_ids in chunk])
+        logger.info(
+            'Reconcile imported moves finished: %d refs reconciled, '
+            'skipped refs: %s', len(plan), skipped)
+        return skipped
@@ -0,0 +1,77 @@
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import escape_psql, split_every
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DELETE_CHUNK_SIZE = 500
+
+
+class AccountMoveImportDelete(models.TransientModel):
+    _name = "account.move.import.delete"
+    _description = "Delete or unpost imported journal entries"
+
+    company_id = fields.Many2one(
+        'res.company', string='Company',
+        required=True, default=lambda self: self.env.company)
+    import_sequence = fields.Char(
+        string='Import Sequence', required=True,
+        help="Sequence of the import, i.e. the start of the Import External ID "
+        "of the journal items, for example IMPORT042.")
+    action = fields.Selection([
+        ('unpost', 'Reset to Draft'),
+        ('delete', 'Delete'),
+        ], required=True, default='delete')
+
+    def _get_moves(self):
+        # The domain uses the index on import_external_id
+        groups = self.env['account.move.line']._read_group([
+            ('company_id', '=', self.company_id.id),
+            ('import_external_id', '=like', '%s-%%' % escape_psql(self.import_sequence.strip())),
+            ], ['move_id'])
+        return self.env['account.move'].browse([move.id for (move,) in groups])
+
+    def _commit(self):
+        # cf account.move.import.job
+        if not getattr(threading.current_thread(), 'testing', False):
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    def run(self):
+        self.ensure_one()
+        moves = self._get_moves()
+        if not moves:
+            raise UserError(_(
+                "There are no journal entries from import '%s'.") % self.import_sequence)
+        logger.info(
+            'Start to %s %d journal entries from import %s',
+            self.action, len(moves), self.import_sequence)
+        # Each chunk is committed, so that a big import doesn't hold the locks
+        # of all its journal entries in one long transaction. If a chunk fails,
+        # the wizard can be run again for the remaining journal entries.
+        done = 0
+        for chunk_ids in split_every(DELETE_CHUNK_SIZE, moves.ids):
+            chunk = moves.browse(chunk_ids)
+            chunk.filtered(lambda m: m.state in ('posted', 'cancel')).button_draft()
+            if self.action == 'delete':
+                chunk.with_context(force_delete=True).unlink()
+            self._commit()
+            done += len(chunk)
+            logger.info('%d/%d journal entries processed', done, len(moves))
+        if self.action == 'delete':
+            message = _("%d journal entries have been deleted.") % len(moves)
+        else:
+            message = _("%d journal entries have been reset to draft.") % len(moves)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'success',
+                'message': message,
+                'next': {'type': 'ir.actions.act_window_close'},
+                },
+            }
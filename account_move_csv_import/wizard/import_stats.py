@@ -0,0 +1,143 @@
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from contextlib import contextmanager
+import cProfile
+import io
+import pstats
+import time
+
+PROFILE_MAX_LINES = 60
+
+
+class ImportStats:
+    # Collect the duration and the number of SQL queries of each stage
+    # of an import. The import is a pipeline of generators (parse -> match
+    # -> split -> prepare -> create), so the time of a stage is measured
+    # without the time of the stages it calls: when a stage starts, the
+    # stage that was running is paused until it ends.
+
+    def __init__(self, cr=None, profile=False):
+        self.cr = cr
+        self.stages = {}
+        self.counters = {}
+        self.profile_result = False
+        self.total_time = 0.0
+        self.total_queries = 0
+        self._stack = []
+        self._start = None
+        self._start_queries = 0
+        self._profiler = profile and cProfile.Profile() or None
+
+    def _query_count(self):
+        return self.cr.sql_log_count if self.cr is not None else 0
+
+    def _charge(self, entry, now, queries):
+        stage = self.stages[entry[0]]
+        stage['time'] += now - entry[1]
+        stage['queries'] += queries - entry[2]
+        entry[1] = now
+        entry[2] = queries
+
+    def _push(self, name):
+        now = time.perf_counter()
+        queries = self._query_count()
+        if self._stack:
+            self._charge(self._stack[-1], now, queries)
+        if name not in self.stages:
+            self.stages[name] = {'time': 0.0, 'queries': 0, 'calls': 0}
+        self.stages[name]['calls'] += 1
+        self._stack.append([name, now, queries])
+
+    def _pop(self):
+        now = time.perf_counter()
+        queries = self._query_count()
+        self._charge(self._stack.pop(), now, queries)
+        if self._stack:
+            self._stack[-1][1] = now
+            self._stack[-1][2] = queries
+
+    @contextmanager
+    def stage(self, name):
+        self._push(name)
+        try:
+            yield
+        finally:
+            self._pop()
+
+    def iter(self, name, iterable):
+        # Wrap an iterator: the time spent to get each item is charged to the stage
+        iterator = iter(iterable)
+        while True:
+            self._push(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._pop()
+            yield item
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._start_queries = self._query_count()
+        if self._profiler:
+            self._profiler.enable()
+
+    def stop(self):
+        if self._profiler:
+            self._profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(self._profiler, stream=output).sort_stats(
+                'cumulative').print_stats(PROFILE_MAX_LINES)
+            self.profile_result = output.getvalue()
+            self._profiler = None
+        self.total_time = time.perf_counter() - self._start
+        self.total_queries = self._query_count() - self._start_queries
+
+    def to_dict(self):
+        return {
+            'total_time': round(self.total_time, 3),
+            'total_queries': self.total_queries,
+            'stages': {
+                name: dict(stage, time=round(stage['time'], 3))
+                for (name, stage) in self.stages.items()},
+            'counters': self.counters,
+            }
+
+    @staticmethod
+    def add_dicts(stats, other):
+        # Sum of 2 results of to_dict(), for the runs of an import job
+        res = {
+            'total_time': round(stats.get('total_time', 0.0) + other.get('total_time', 0.0), 3),
+            'total_queries': stats.get('total_queries', 0) + other.get('total_queries', 0),
+            'stages': dict(stats.get('stages', {})),
+            'counters': dict(stats.get('counters', {})),
+            }
+        for name, stage in other.get('stages', {}).items():
+            total = res['stages'].get(name, {'time': 0.0, 'queries': 0, 'calls': 0})
+            res['stages'][name] = {
+                'time': round(total['time'] + stage['time'], 3),
+                'queries': total['queries'] + stage['queries'],
+                'calls': total['calls'] + stage['calls'],
+                }
+        for name, value in other.get('counters', {}).items():
+            res['counters'][name] = res['counters'].get(name, 0) + value
+        return res
+
+    @staticmethod
+    def format_summary(stats):
+        # Human readable version of to_dict()
+        lines = ['%-12s %10s %10s %10s' % ('Stage', 'Seconds', 'Queries', 'Calls')]
+        for name, stage in stats.get('stages', {}).items():
+            lines.append('%-12s %10.3f %10d %10d' % (
+                name, stage['time'], stage['queries'], stage['calls']))
+        lines.append('%-12s %10.3f %10d' % (
+            'total', stats.get('total_time', 0.0), stats.get('total_queries', 0)))
+        lines.append('')
+        for name, value in stats.get('counters', {}).items():
+            lines.append('%-24s %10s' % (name, value))
+        return '\n'.join(lines)
@@ -0,0 +1,682 @@
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo.exceptions import UserError
+from odoo.tools import float_is_zero, float_round
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime, date as datelib
+from functools import lru_cache
+from itertools import islice
+from lxml import etree
+import csv
+import hashlib
+import io
+import logging
+import sys
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+# A file usually has a few hundred distinct dates for 100 000s of lines
+DATE_CACHE_SIZE = 4096
+# and a lot of repeated amounts (empty amounts, VAT, recurring amounts)
+AMOUNT_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(date_str, date_format):
+    # Raises ValueError like datetime.strptime(). Errors are not cached.
+    return datetime.strptime(date_str, date_format).date()
+
+
+@lru_cache(maxsize=AMOUNT_CACHE_SIZE)
+def parse_amount(amount_str):
+    # Amount with a dot or a coma (French) as decimal separator.
+    # Empty amount = 0. Raises ValueError like float(). Errors are not cached.
+    if not amount_str:
+        return 0.0
+    if ',' in amount_str:
+        amount_str = amount_str.replace(',', '.')
+    return float(amount_str)
+
+
+def skip_rows(rows, count):
+    # Consume the first rows of an iterator without converting them,
+    # to start the parsing of a file after a line
+    if count:
+        deque(islice(rows, count), maxlen=0)
+
+
+ODS_TABLE_NS = '{urn:oasis:names:tc:opendocument:xmlns:table:1.0}'
+ODS_OFFICE_NS = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}'
+ODS_TEXT_NS = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+ODS_CELL_TAGS = (ODS_TABLE_NS + 'table-cell', ODS_TABLE_NS + 'covered-table-cell')
+ODS_COLUMNS_REPEATED = ODS_TABLE_NS + 'number-columns-repeated'
+ODS_VALUE_TYPE = ODS_OFFICE_NS + 'value-type'
+ODS_TEXT_P = ODS_TEXT_NS + 'p'
+
+
+def iter_ods_rows(fileobj, columns, start_row=0):
+    # Read the rows of the first sheet of an ODS file without loading
+    # the sheet in memory: content.xml is parsed incrementally and each row
+    # is removed from the XML tree once it has been read.
+    # Yield (row number, list of the values of the first 'columns' columns)
+    # for the rows after start_row that are not empty.
+    table_tag = ODS_TABLE_NS + 'table'
+    row_tag = ODS_TABLE_NS + 'table-row'
+    row_number = 0
+    with zipfile.ZipFile(fileobj) as zf, zf.open('content.xml') as content:
+        for event, elem in etree.iterparse(
+                content, events=('end',), tag=(table_tag, row_tag),
+                resolve_entities=False, no_network=True):
+            if elem.tag == table_tag:
+                break  # only the first sheet is imported
+            repeat = int(elem.get(ODS_TABLE_NS + 'number-rows-repeated', 1))
+            # the cells of the rows before start_row are not read
+            values = row_number + repeat > start_row and ods_row_values(elem, columns)
+            elem.clear(keep_tail=True)
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+            # LibreOffice writes the empty rows at the end of the sheet
+            # as one row repeated ~1 million times
+            if not values or not any(value not in (None, '') for value in values):
+                row_number += repeat
+                continue
+            for i in range(repeat):
+                row_number += 1
+                if row_number > start_row:
+                    yield row_number, values
+
+
+def ods_row_values(row, columns):
+    values = []
+    for cell in row:
+        if cell.tag not in ODS_CELL_TAGS:
+            continue
+        value = ods_cell_value(cell)
+        repeat = cell.get(ODS_COLUMNS_REPEATED)
+        if repeat is None:
+            values.append(value)
+        else:
+            values.extend([value] * min(int(repeat), columns - len(values)))
+        if len(values) >= columns:
+            break
+    values.extend([None] * (columns - len(values)))
+    return values
+
+
+def ods_cell_value(cell):
+    value_type = cell.get(ODS_VALUE_TYPE)
+    if value_type in ('float', 'currency', 'percentage'):
+        return float(cell.get(ODS_OFFICE_NS + 'value'))
+    elif value_type == 'date':
+        # date-value is 2024-01-31 or 2024-01-31T00:00:00
+        return parse_date(cell.get(ODS_OFFICE_NS + 'date-value')[:10], '%Y-%m-%d')
+    elif value_type == 'boolean':
+        return cell.get(ODS_OFFICE_NS + 'boolean-value') == 'true'
+    if not len(cell):
+        return None
+    # Usual case: the text is in one paragraph, without formatting
+    if len(cell) == 1 and cell[0].tag == ODS_TEXT_P and not len(cell[0]):
+        return cell[0].text or None
+    text = '\n'.join(''.join(p.itertext()) for p in cell.iter(ODS_TEXT_P))
+    return text or None
+
+
+# Keys of the pivot lines written by the parsers and by the matching
+PIVOT_FIELDS = (
+    'line', 'date', 'journal', 'account', 'partner', 'analytic', 'name',
+    'debit', 'credit', 'ref', 'move_name', 'reconcile_ref',
+    'journal_id', 'account_id', 'partner_id', 'analytic_distribution')
+# The codes are repeated on many lines: they are interned to be stored once
+PIVOT_INTERNED_FIELDS = frozenset(['journal', 'account', 'partner', 'analytic'])
+_PIVOT_FIELDS_SET = frozenset(PIVOT_FIELDS)
+
+
+class PivotLine:
+    # Pivot line stored in slots instead of a dict, to reduce the memory
+    # used by big files. It has the same API as a dict, so the code
+    # that reads the pivot lines works with both: parsers of inheriting
+    # modules can still yield plain dicts. Keys that are not in PIVOT_FIELDS
+    # are stored in the _extra dict.
+    __slots__ = PIVOT_FIELDS + ('_extra',)
+
+    def __init__(self, vals=None, **kwargs):
+        self._extra = None
+        if vals:
+            self.update(vals)
+        # same as self.update(kwargs), inlined because the parsers
+        # create the pivot lines with keyword arguments
+        for key, value in kwargs.items():
+            if key in _PIVOT_FIELDS_SET:
+                if key in PIVOT_INTERNED_FIELDS and type(value) is str:
+                    value = sys.intern(value)
+                setattr(self, key, value)
+            else:
+                self[key] = value
+
+    def __getitem__(self, key):
+        if key in _PIVOT_FIELDS_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in _PIVOT_FIELDS_SET:
+            if key in PIVOT_INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _PIVOT_FIELDS_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in _PIVOT_FIELDS_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def get(self, key, default=None):
+        if key in _PIVOT_FIELDS_SET:
+            return getattr(self, key, default)
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def keys(self):
+        keys = [key for key in PIVOT_FIELDS if hasattr(self, key)]
+        if self._extra:
+            keys += list(self._extra)
+        return keys
+
+    # items() and values() return lists, so the values can be modified
+    # while iterating, like clean_strip_pivot() does
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def update(self, other=(), **kwargs):
+        if hasattr(other, 'items'):
+            other = other.items()
+        for key, value in other:
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def copy(self):
+        return PivotLine(self)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (PivotLine, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'PivotLine(%r)' % self.to_dict()
+
+    # __slots__ objects without __dict__ can be pickled (for the processes
+    # of the parallel validation), but the unset slots must be skipped
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self._extra = None
+        self.update(state)
+
+
+# The functions below check the pivot lines. They don't use the ORM, so that
+# they can run in the processes of the parallel validation: everything
+# they need is given as argument, including the (translated) error messages.
+
+
+class AccountCodeResolver:
+    # Match the account codes of the imported file with the account codes
+    # of Odoo. Odoo codes are kept in a sorted list, so that the prefix match
+    # is a bisect and not a scan of all the accounts. The result is memoized
+    # for each imported code, because the same codes are used on many lines.
+
+    def __init__(self, code2id):
+        self.code2id = code2id
+        self.sorted_codes = sorted(code2id)
+        self.cache = {}
+
+    def resolve(self, code):
+        if code not in self.cache:
+            self.cache[code] = self._resolve(code)
+        return self.cache[code]
+
+    def _resolve(self, code):
+        if not code:
+            return False
+        if code in self.code2id:
+            return self.code2id[code]
+        # Match when import = 61100000 and Odoo has 611000
+        for size in range(len(code) - 1, len(code.rstrip('0')) - 1, -1):
+            if size and code[:size] in self.code2id:
+                return self.code2id[code[:size]]
+        # Match when import = 611000 and Odoo has 611000XX
+        # The first code >= import code is the smallest code with this prefix
+        index = bisect_left(self.sorted_codes, code)
+        if index < len(self.sorted_codes) and self.sorted_codes[index].startswith(code):
+            odoo_code = self.sorted_codes[index]
+            logger.warning(
+                "Approximate match: import account %s has been matched "
+                "with Odoo account %s", code, odoo_code)
+            return self.code2id[odoo_code]
+        return False
+
+
+def match_pivot_line(l, speeddict, errors, messages):
+    assert l.get('line') and isinstance(l.get('line'), int), \
+        'missing line number'
+    l['account_id'] = speeddict['account_resolver'].resolve(l['account'])
+    if not l.get('account_id'):
+        errors['account'].setdefault(l['account'], []).append(l['line'])
+    if l.get('partner'):
+        if l['partner'] in speeddict['partner']:
+            l['partner_id'] = speeddict['partner'][l['partner']]
+        else:
+            errors['partner'].setdefault(l['partner'], []).append(l['line'])
+    if l.get('analytic'):
+        match_analytic(l, speeddict, errors, messages)
+
+    if l['journal'] in speeddict['journal']:
+        l['journal_id'] = speeddict['journal'][l['journal']]
+    else:
+        errors['journal'].setdefault(l['journal'], []).append(l['line'])
+    if not l.get('date'):
+        errors['other'].append(messages['missing_date'] % l['line'])
+    else:
+        if not isinstance(l.get('date'), datelib):
+            try:
+                l['date'] = parse_date(l['date'], '%Y-%m-%d')
+            except Exception:
+                errors['other'].append(messages['bad_date'] % (l['line'], l['date']))
+    # On bad amounts, we set 0 to be able to continue the checks
+    # of the split of the moves. This line will never be written.
+    if not isinstance(l.get('credit'), (float, int)):
+        errors['other'].append(messages['bad_credit'] % (l['line'], l['credit']))
+        l['credit'] = 0.0
+    if not isinstance(l.get('debit'), (float, int)):
+        errors['other'].append(messages['bad_debit'] % (l['line'], l['debit']))
+        l['debit'] = 0.0
+
+
+def match_analytic(l, speeddict, errors, messages):
+    # The same analytic strings are used on many lines: they are parsed
+    # once and the result is cached in speeddict['analytic_cache'], with
+    # the errors without the line number
+    cache = speeddict['analytic_cache']
+    if l['analytic'] not in cache:
+        cache[l['analytic']] = parse_analytic(l['analytic'], speeddict)
+    distribution, analytic_errors = cache[l['analytic']]
+    # the distribution is shared by all the lines with the same analytic
+    # string: it must not be modified
+    l['analytic_distribution'] = distribution
+    for error in analytic_errors:
+        if error[0] == 'analytic':
+            errors['analytic'].setdefault(error[1], []).append(l['line'])
+        else:
+            errors['other'].append(messages[error[0]] % ((l['line'],) + error[1:]))
+
+
+def parse_analytic(analytic, speeddict):
+    # Return the analytic distribution and the list of errors of an analytic
+    # string such as 'ADM:39.4|SUPP:60.6'
+    distribution = {}
+    analytic_errors = []
+    for ana_entry in analytic.split('|'):
+        ana_entry = ana_entry.strip()
+        if ana_entry:
+            ana_entry_split = ana_entry.split(':')
+            if len(ana_entry_split) == 1:
+                ana_account_code = ana_entry_split[0].strip()
+                ana_pct = 100
+            elif len(ana_entry_split) > 1:
+                ana_account_code = ':'.join(ana_entry_split[:-1]).strip()
+                ana_pct_str = ana_entry_split[-1]
+                ana_pct_str_ready = ana_pct_str.replace(',', '.')
+                try:
+                    ana_pct = float(ana_pct_str_ready)
+                except Exception:
+                    analytic_errors.append(('analytic_pct_nan', ana_pct_str))
+                    ana_pct = 1
+                if ana_pct < 0 or ana_pct > 100:
+                    analytic_errors.append(('analytic_pct_range', ana_pct_str))
+            if ana_account_code in speeddict['analytic']:
+                distribution[speeddict['analytic'][ana_account_code]] = ana_pct
+            else:
+                analytic_errors.append(('analytic', ana_account_code))
+    # The percentages of the analytic accounts of the same plan
+    # can't be more than 100
+    plan_totals = {}
+    for analytic_id, ana_pct in distribution.items():
+        plan_id = speeddict['analytic_plan'].get(analytic_id)
+        plan_totals[plan_id] = plan_totals.get(plan_id, 0) + ana_pct
+    for total in plan_totals.values():
+        if total > 100.001:
+            analytic_errors.append(('analytic_pct_sum', analytic, round(total, 2)))
+            break
+    return distribution, analytic_errors
+
+
+class MoveSplitter:
+    # State of the split of the pivot lines in moves, shared by
+    # split_pivot() and iter_pivot_chunks() so that they cut the
+    # moves at the same lines
+
+    def __init__(self, options):
+        self.skip_null_lines = options['skip_null_lines']
+        self.split_move_method = options['split_move_method']
+        self.date_by_move_line = options['date_by_move_line']
+        self.rounding = options['rounding']
+        self.started = False
+        self.journal_id = False
+        self.move_name = False
+        self.date = False
+        self.balance = 0.0
+
+    def is_skipped(self, credit, debit):
+        return (
+            self.skip_null_lines and
+            float_is_zero(credit, precision_rounding=self.rounding) and
+            float_is_zero(debit, precision_rounding=self.rounding))
+
+    def new_move(self, journal_id, move_name, date, credit, debit):
+        # Return True if the line starts a new move
+        if self.split_move_method == 'move_name':
+            same_move = self.move_name == move_name
+        else:  # balanced
+            same_move = (
+                self.journal_id == journal_id and
+                not float_is_zero(self.balance, precision_rounding=self.rounding) and
+                (self.date_by_move_line or self.date == date))
+        new_move = not (self.started and same_move)
+        if new_move:
+            self.started = True
+            self.journal_id = journal_id
+            self.move_name = move_name
+            self.date = date
+            self.balance = 0.0
+        self.balance += credit - debit
+        return new_move
+
+
+def split_pivot(pivot, errors, options, messages):
+    # Generator that yields the list of the pivot lines of each move
+    rounding = options['rounding']
+    splitter = MoveSplitter(options)
+    cur_move_lines = []
+    for l in pivot:
+        if splitter.is_skipped(l['credit'], l['debit']):
+            logger.info('Skip line %d which has debit=credit=0', l['line'])
+            continue
+        move_name = l.get('move_name')
+        if options['split_move_method'] == 'move_name' and not move_name:
+            errors['other'].append(messages['missing_move_name'] % l['line'])
+        if splitter.new_move(
+                l.get('journal_id'), move_name, l['date'], l['credit'], l['debit']):
+            if cur_move_lines:
+                check_move_lines(cur_move_lines, errors, messages, rounding)
+                yield cur_move_lines
+            cur_move_lines = [l]
+        else:  # append to current move
+            cur_move_lines.append(l)
+    if cur_move_lines:
+        check_move_lines(cur_move_lines, errors, messages, rounding)
+        yield cur_move_lines
+
+
+def check_move_lines(move_lines, errors, messages, rounding):
+    if len(move_lines) <= 1:
+        errors['other'].append(messages['one_line_move'] % move_lines[0]['line'])
+    # With the split by journal entry number, or when the journal or the
+    # date changes, a move can end without being balanced
+    balance = sum(l['credit'] - l['debit'] for l in move_lines)
+    if not float_is_zero(balance, precision_rounding=rounding):
+        errors['other'].append(messages['unbalanced_move'] % (
+            move_lines[0]['line'], float_round(balance, precision_rounding=rounding)))
+
+
+def collect_move_name(move_lines, move_names, errors, messages, fingerprints=None, digits=2):
+    # Journal entry numbers must be unique per journal. move_names is
+    # a dict with key = (journal_id, move_name) and value = first line
+    # of the move. The fingerprints of the moves are collected with the
+    # same key when fingerprints is a dict.
+    l = move_lines[0]
+    if not l.get('move_name'):
+        return
+    key = (l.get('journal_id'), l['move_name'])
+    if key in move_names:
+        errors['other'].append(messages['duplicate_move_name'] % (
+            l['line'], l['move_name'], move_names[key]))
+    else:
+        move_names[key] = l['line']
+        if fingerprints is not None:
+            fingerprints[key] = move_fingerprint(move_lines, digits)
+
+
+def merge_move_names(
+        move_names, new_move_names, errors, messages,
+        fingerprints=None, new_fingerprints=None):
+    for (journal_id, move_name), line in new_move_names.items():
+        if (journal_id, move_name) in move_names:
+            errors['other'].append(messages['duplicate_move_name'] % (
+                line, move_name, move_names[(journal_id, move_name)]))
+        else:
+            move_names[(journal_id, move_name)] = line
+            if fingerprints is not None and new_fingerprints:
+                fingerprints[(journal_id, move_name)] = \
+                    new_fingerprints[(journal_id, move_name)]
+
+
+def move_fingerprint(move_lines, digits):
+    # Hash of the journal, date, number, partners and amounts of a matched
+    # move, used to find the moves of a file that have already been imported
+    l = move_lines[0]
+    amounts = sorted(
+        (line['account_id'], line.get('partner_id') or 0,
+         round(line['debit'], digits), round(line['credit'], digits))
+        for line in move_lines)
+    key = '%s|%s|%s|%s' % (
+        l['journal_id'], l['date'], l.get('move_name') or '',
+        ';'.join('%d:%d:%.*f:%.*f' % (account_id, partner_id, digits, debit, digits, credit)
+                 for (account_id, partner_id, debit, credit) in amounts))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class ImportValidationError(UserError):
+    # The errors of the check of a file: report is the list of all the
+    # errors, the message only has a sample of them
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+class ErrorBudget:
+    # Maximum number of errors and of distinct unknown codes of the check
+    # of the files of an import (0 = no limit). With a wrong delimiter or
+    # date format, all the lines of a file have errors: the check stops
+    # when it is exceeded. The errors of the files of an archive are added
+    # with add_file().
+
+    def __init__(self, max_errors=0, max_codes=0):
+        self.max_errors = max_errors
+        self.max_codes = max_codes
+        self.exceeded = False
+        # errors of the files that have already been checked
+        self.file_error_count = 0
+        self.file_codes = set()
+
+    def __bool__(self):
+        return bool(self.max_errors or self.max_codes)
+
+    def _get_codes(self, errors):
+        return {
+            (key, code) for (key, value) in errors.items()
+            if isinstance(value, dict) for code in value}
+
+    def check(self, errors):
+        # errors are the errors of the file being checked
+        error_count = self.file_error_count + count_pivot_errors(errors)[0]
+        code_count = self.max_codes and len(self.file_codes | self._get_codes(errors))
+        if (
+                (self.max_errors and error_count >= self.max_errors) or
+                (self.max_codes and code_count >= self.max_codes)):
+            self.exceeded = True
+        return self.exceeded
+
+    def add_file(self, errors):
+        # Add the errors of a file that has been checked
+        self.file_error_count += count_pivot_errors(errors)[0]
+        if self.max_codes:
+            self.file_codes |= self._get_codes(errors)
+        return self.check({})
+
+
+class ErrorBudgetExceeded(Exception):
+    # Raised to stop the check of a file, with the number of checked lines
+    def __init__(self, line_count):
+        super().__init__(line_count)
+        self.line_count = line_count
+
+
+class ImportJobPaused(Exception):
+    # Raised to stop an import job after the chunks of one run of the cron:
+    # the next run resumes it after its checkpoint
+    pass
+
+
+def count_pivot_errors(errors):
+    # Return the number of errors (an unknown code counts once per line)
+    # and the number of distinct unknown codes
+    error_count = code_count = 0
+    for value in errors.values():
+        if isinstance(value, list):
+            error_count += len(value)
+        else:
+            code_count += len(value)
+            error_count += sum(len(lines) for lines in value.values())
+    return error_count, code_count
+
+
+def error_report2csv(report, header):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(header)
+    writer.writerows(report)
+    return output.getvalue().encode('utf-8')
+
+
+def merge_pivot_errors(errors, new_errors):
+    for key, value in new_errors.items():
+        if isinstance(value, list):
+            errors[key] += value
+        else:
+            for code, lines in value.items():
+                errors[key].setdefault(code, []).extend(lines)
+
+
+def iter_pivot_chunks(pivot, options, chunk_size, journal_code2id):
+    # Cut the pivot in chunks of about chunk_size lines, only where
+    # split_pivot() starts a new move, so that each chunk can be checked
+    # independently. The lines are not matched yet: the journal, the date
+    # and the amounts are read as match_pivot_line() will set them.
+    splitter = MoveSplitter(options)
+    chunk = []
+    for l in pivot:
+        date = l.get('date')
+        if date and not isinstance(date, datelib):
+            try:
+                date = parse_date(date, '%Y-%m-%d')
+            except Exception:
+                pass
+        credit, debit = (
+            isinstance(l.get(field), (float, int)) and l[field] or 0.0
+            for field in ('credit', 'debit'))
+        if not splitter.is_skipped(credit, debit) and splitter.new_move(
+                journal_code2id.get(l['journal']), l.get('move_name'), date,
+                credit, debit):
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        chunk.append(l)
+    if chunk:
+        yield chunk
+
+
+# Context of the processes of the parallel validation. With the 'fork' start
+# method, it is inherited from the parent process without being pickled.
+_validation_context = {}
+
+
+def init_validation_worker(speeddict, options, messages, empty_errors):
+    _validation_context.update({
+        'speeddict': speeddict,
+        'options': options,
+        'messages': messages,
+        'empty_errors': empty_errors,
+        })
+
+
+def validate_pivot_chunk(chunk):
+    ctx = _validation_context
+    errors = {
+        key: value.copy() for (key, value) in ctx['empty_errors'].items()}
+    line_count = move_count = 0
+    move_names = {}
+    options = ctx['options']
+    fingerprints = options['fingerprint_digits'] is not None and {} or None
+    for l in chunk:
+        match_pivot_line(l, ctx['speeddict'], errors, ctx['messages'])
+    for move_lines in split_pivot(chunk, errors, options, ctx['messages']):
+        move_count += 1
+        line_count += len(move_lines)
+        if options['check_move_names']:
+            collect_move_name(
+                move_lines, move_names, errors, ctx['messages'],
+                fingerprints, options['fingerprint_digits'])
+    return errors, line_count, move_count, move_names, fingerprints
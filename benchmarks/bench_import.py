@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Benchmark the import of journal entries by account_move_csv_import.
+
+For each file format, a synthetic file is generated (cf generate_files.py)
+and imported in a database where account_move_csv_import is installed.
+Each stage of the import is timed separately: parse, clean, speeddict,
+match, split, create, post and reconcile. The results are printed and
+appended as JSON lines to the output file, to compare versions.
+Everything is rolled back at the end, the database is not modified.
+
+Usage (from the directory of odoo-bin, or with odoo in the python path):
+    python bench_import.py -c odoo.conf -d benchdb --format fec_txt --lines 10000 50000
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import generate_files
+
+STAGES = [
+    'parse', 'clean', 'speeddict', 'match', 'split', 'create', 'post', 'reconcile']
+
+
+class Stage:
+
+    def __init__(self, name, results, env, trace_memory):
+        self.name = name
+        self.results = results
+        self.env = env
+        self.trace_memory = trace_memory
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self.queries = self.env.cr.sql_log_count
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type:
+            return
+        self.env.flush_all()
+        res = {
+            'time': round(time.perf_counter() - self.start, 3),
+            'queries': self.env.cr.sql_log_count - self.queries,
+            }
+        if self.trace_memory:
+            res['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        self.results[self.name] = res
+
+
+def prepare_master_data(env, company, args):
+    """Create the journal, accounts, partners and analytic accounts
+    used by the generated files, when they don't exist"""
+    journal = env['account.journal'].search([
+        ('code', '=', generate_files.JOURNAL), ('company_id', '=', company.id)])
+    if not journal:
+        env['account.journal'].create({
+            'code': generate_files.JOURNAL, 'name': 'Benchmark',
+            'type': 'general', 'company_id': company.id})
+    accounts = {
+        generate_files.RECEIVABLE_ACCOUNT: ('asset_receivable', True),
+        generate_files.BANK_ACCOUNT: ('asset_current', False),
+        }
+    for code in generate_files.income_account_codes(args.accounts):
+        accounts[code] = ('income', False)
+    existing = set(env['account.account'].search([
+        ('code', 'in', list(accounts)), ('company_id', '=', company.id)]).mapped('code'))
+    env['account.account'].create([{
+        'code': code, 'name': 'Benchmark %s' % code, 'account_type': account_type,
+        'reconcile': reconcile, 'company_id': company.id}
+        for code, (account_type, reconcile) in accounts.items() if code not in existing])
+    refs = generate_files.partner_refs(args.partners)
+    existing = set(env['res.partner'].search([('ref', 'in', refs)]).mapped('ref'))
+    env['res.partner'].create([
+        {'name': 'Benchmark %s' % ref, 'ref': ref} for ref in refs if ref not in existing])
+    codes = generate_files.analytic_codes(args.analytics)
+    existing = set(env['account.analytic.account'].search([('code', 'in', codes)]).mapped('code'))
+    if len(existing) < len(codes):
+        plan = env['account.analytic.plan'].create({'name': 'Benchmark'})
+        env['account.analytic.account'].create([{
+            'name': 'Benchmark %s' % code, 'code': code, 'plan_id': plan.id,
+            'company_id': company.id} for code in codes if code not in existing])
+    env.flush_all()
+
+
+def run_stages(env, wiz, path, trace_memory):
+    results = {}
+
+    def stage(name):
+        return Stage(name, results, env, trace_memory)
+
+    with open(path, 'rb') as fileobj:
+        with stage('parse'):
+            pivot = list(wiz.file2pivot(fileobj))
+    with stage('clean'):
+        forced_vals = wiz._prepare_pivot_forced_vals()
+        for l in pivot:
+            wiz._clean_strip_pivot_line(l)
+            wiz._update_pivot_line(l, forced_vals)
+    with stage('speeddict'):
+        speeddict = wiz._prepare_import_speeddict(wiz.company_id.id)
+    errors = wiz._prepare_pivot_errors()
+    with stage('match'):
+        pivot = list(wiz._match_pivot(iter(pivot), speeddict, errors))
+    with stage('split'):
+        moves_lines = list(wiz._split_pivot(iter(pivot), errors))
+    msg = wiz._pivot_errors2msg(errors)
+    if msg:
+        raise SystemExit(msg)
+    seq = env['ir.sequence'].next_by_code('account.move.import')
+    with stage('create'):
+        moves = wiz._create_moves(
+            wiz._prepare_move_with_lines(move_lines, seq) for move_lines in moves_lines)
+    with stage('post'):
+        moves.with_context(**wiz._get_creation_context()).action_post()
+    with stage('reconcile'):
+        wiz.reconcile_move_lines(moves)
+    results['lines'] = len(pivot)
+    results['moves'] = len(moves)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-c', '--config', help='Odoo configuration file')
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument(
+        '--format', nargs='+', default=generate_files.FORMATS,
+        choices=generate_files.FORMATS)
+    parser.add_argument('--lines', type=int, nargs='+', default=[10000])
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--partners', type=int, default=1000)
+    parser.add_argument('--analytics', type=int, default=10)
+    parser.add_argument(
+        '--creation-mode', default='orm', choices=['orm', 'orm_fast'],
+        help='Creation mode of the journal entries (cf check_creation_modes.py)')
+    parser.add_argument(
+        '--trace-memory', action='store_true',
+        help='Measure the peak memory of each stage with tracemalloc (slower)')
+    parser.add_argument('-o', '--output', default='bench_output.txt')
+    args = parser.parse_args()
+
+    import odoo
+    from odoo import api, SUPERUSER_ID
+    odoo_args = ['-d', args.database]
+    if args.config:
+        odoo_args += ['-c', args.config]
+    odoo.tools.config.parse_config(odoo_args)
+    if args.trace_memory:
+        tracemalloc.start()
+    registry = odoo.modules.registry.Registry(args.database)
+    revision = git_revision()
+    with registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        company = env.company
+        prepare_master_data(env, company, args)
+        journal = env['account.journal'].search([
+            ('code', '=', generate_files.JOURNAL), ('company_id', '=', company.id)])
+        for file_format in args.format:
+            for lines in args.lines:
+                with tempfile.NamedTemporaryFile(prefix='bench-move-import-') as tmp:
+                    generate_files.generate(
+                        file_format, tmp.name, lines, args.accounts,
+                        args.partners, args.analytics)
+                    wiz = env['account.move.import'].create({
+                        'company_id': company.id,
+                        'file_format': generate_files.WIZARD_FORMAT.get(file_format, file_format),
+                        'file_encoding': file_format in ('quadra', 'nibelis') and 'latin1' or 'utf-8',
+                        'force_journal_id': file_format == 'payfit' and journal.id or False,
+                        'force_move_date': file_format == 'payfit' and '2024-01-31' or False,
+                        'creation_mode': args.creation_mode,
+                        })
+                    cr.execute('SAVEPOINT bench')
+                    start = time.perf_counter()
+                    results = run_stages(env, wiz, tmp.name, args.trace_memory)
+                    results.update({
+                        'format': file_format,
+                        'creation_mode': args.creation_mode,
+                        'requested_lines': lines,
+                        'total_time': round(time.perf_counter() - start, 3),
+                        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                        'revision': revision,
+                        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                        })
+                    cr.execute('ROLLBACK TO SAVEPOINT bench')
+                    env.invalidate_all()
+                print('%s %d lines (%d moves): %.1fs total' % (
+                    file_format, results['lines'], results['moves'], results['total_time']))
+                for name in STAGES:
+                    print('    %-10s %8.3fs %8d queries %s' % (
+                        name, results[name]['time'], results[name]['queries'],
+                        'peak %.1f MB' % results[name]['peak_memory_mb']
+                        if 'peak_memory_mb' in results[name] else ''))
+                with open(args.output, 'a') as f:
+                    f.write(json.dumps(results) + '\n')
+        cr.rollback()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
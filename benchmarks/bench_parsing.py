@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Micro-benchmark of the conversion of dates and amounts by the parsers.
+
+Compare datetime.strptime() + float(x.replace(',', '.')) on each line
+with parse_date() and parse_amount() of account_move_csv_import.
+It only needs odoo in the python path, not a database.
+
+The amounts are converted twice: with mixed decimal separators and
+with French amounts only (coma as decimal separator).
+
+Usage:
+    python bench_parsing.py --lines 500000 --dates 365 --amounts 20000
+"""
+
+import argparse
+from datetime import date, datetime, timedelta
+import importlib.util
+import os
+import random
+import timeit
+
+import_tools_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir,
+    'account_move_csv_import', 'wizard', 'import_tools.py')
+spec = importlib.util.spec_from_file_location('import_tools', import_tools_path)
+import_tools = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(import_tools)
+
+
+def generate_values(lines, dates, amounts, french=False, seed=42):
+    rand = random.Random(seed)
+    start = date(2024, 1, 1)
+    date_strs = [
+        (start + timedelta(days=d)).strftime('%d/%m/%Y') for d in range(dates)]
+    amount_strs = [
+        '%.2f' % (rand.randint(1, 1000000) / 100) for a in range(amounts)]
+    values = []
+    for i in range(lines):
+        amount = rand.choice(amount_strs)
+        if french or i % 2:
+            amount = amount.replace('.', ',')  # French decimal separator
+        values.append((rand.choice(date_strs), amount, i % 3 and '0' or ''))
+    return values
+
+
+def old_parsing(values):
+    for date_str, amount, other_amount in values:
+        datetime.strptime(date_str, '%d/%m/%Y')
+        float(amount.replace(',', '.'))
+        float((other_amount or '0').replace(',', '.'))
+
+
+def new_parsing(values):
+    parse_date = import_tools.parse_date
+    parse_amount = import_tools.parse_amount
+    for date_str, amount, other_amount in values:
+        parse_date(date_str, '%d/%m/%Y')
+        parse_amount(amount)
+        parse_amount(other_amount)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--lines', type=int, default=500000)
+    parser.add_argument('--dates', type=int, default=365)
+    parser.add_argument('--amounts', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    for label, french in [('Mixed amounts', False), ('French amounts', True)]:
+        values = generate_values(args.lines, args.dates, args.amounts, french)
+        for date_str, amount, other_amount in values[:1000]:
+            assert import_tools.parse_date(date_str, '%d/%m/%Y') == \
+                datetime.strptime(date_str, '%d/%m/%Y').date()
+            assert import_tools.parse_amount(amount) == float(amount.replace(',', '.'))
+        print(label)
+        results = {}
+        for name, func in [('strptime/float', old_parsing), ('parse_date/parse_amount', new_parsing)]:
+            import_tools.parse_date.cache_clear()
+            import_tools.parse_amount.cache_clear()
+            results[name] = min(timeit.repeat(
+                lambda: func(values), number=1, repeat=args.repeat))
+            print('  %-25s %8.3fs  %6.2f us/line' % (
+                name, results[name], results[name] * 1e6 / args.lines))
+        print('  Speedup: x%.1f' % (
+            results['strptime/float'] / results['parse_date/parse_amount']))
+
+
+if __name__ == '__main__':
+    main()
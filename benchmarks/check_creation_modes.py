@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Check that the creation modes of account_move_csv_import give the same data.
+
+For each file format, a synthetic file is generated (cf generate_files.py)
+and imported with each creation mode (Standard, High Volume and, for FEC
+files, Migration), in a savepoint that is rolled back. The stored fields
+of the journal entries and journal items created by each mode are compared
+with the ones of the Standard mode. The script exits with an error if
+there is a difference.
+
+Usage (from the directory of odoo-bin, or with odoo in the python path):
+    python check_creation_modes.py -c odoo.conf -d benchdb --format fec_txt payfit
+"""
+
+import argparse
+import sys
+import tempfile
+
+import generate_files
+from bench_import import prepare_master_data
+
+MAX_REPORTED_DIFFS = 50
+
+
+def import_moves(env, wiz_vals, creation_mode, path):
+    """Import the file with this creation mode and return the check values
+    of the created moves, without the sequence of the import"""
+    wiz = env['account.move.import'].create(dict(wiz_vals, creation_mode=creation_mode))
+    with open(path, 'rb') as fileobj:
+        with wiz._open_import_files(fileobj) as files:
+            moves = wiz.create_moves_from_pivots(wiz._get_pivots(files), post=True)
+    res = []
+    for move in moves.sorted('id'):
+        for label, values in wiz._get_move_check_values(move):
+            if values.get('import_external_id'):
+                # IMPORT042-12 -> 12
+                values['import_external_id'] = values['import_external_id'].split('-', 1)[1]
+            res.append(('%s %s' % (move.name, label), values))
+    return res
+
+
+def compare(reference, result):
+    diffs = []
+    if len(reference) != len(result):
+        diffs.append('%d records instead of %d' % (len(result), len(reference)))
+    for (label, ref_values), (label, values) in zip(reference, result):
+        for name, value in ref_values.items():
+            if values.get(name) != value:
+                diffs.append('%s, %s: %r instead of %r' % (label, name, values.get(name), value))
+    return diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-c', '--config', help='Odoo configuration file')
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument(
+        '--format', nargs='+', default=generate_files.FORMATS,
+        choices=generate_files.FORMATS)
+    parser.add_argument('--lines', type=int, default=500)
+    parser.add_argument('--accounts', type=int, default=20)
+    parser.add_argument('--partners', type=int, default=50)
+    parser.add_argument('--analytics', type=int, default=5)
+    args = parser.parse_args()
+
+    import odoo
+    from odoo import api, SUPERUSER_ID
+    odoo_args = ['-d', args.database]
+    if args.config:
+        odoo_args += ['-c', args.config]
+    odoo.tools.config.parse_config(odoo_args)
+    registry = odoo.modules.registry.Registry(args.database)
+    failed = False
+    with registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        company = env.company
+        prepare_master_data(env, company, args)
+        journal = env['account.journal'].search([
+            ('code', '=', generate_files.JOURNAL), ('company_id', '=', company.id)])
+        for file_format in args.format:
+            modes = ['orm', 'orm_fast']
+            if file_format == 'fec_txt':
+                modes.append('sql')
+            wiz_vals = {
+                'company_id': company.id,
+                'file_format': generate_files.WIZARD_FORMAT.get(file_format, file_format),
+                'file_encoding': file_format in ('quadra', 'nibelis') and 'latin1' or 'utf-8',
+                'force_journal_id': file_format == 'payfit' and journal.id or False,
+                'force_move_date': file_format == 'payfit' and '2024-01-31' or False,
+                # each mode imports the same moves
+                'skip_imported_moves': False,
+                }
+            with tempfile.NamedTemporaryFile(prefix='check-move-import-') as tmp:
+                generate_files.generate(
+                    file_format, tmp.name, args.lines, args.accounts,
+                    args.partners, args.analytics)
+                results = {}
+                for mode in modes:
+                    cr.execute('SAVEPOINT check_modes')
+                    results[mode] = import_moves(env, wiz_vals, mode, tmp.name)
+                    cr.execute('ROLLBACK TO SAVEPOINT check_modes')
+                    env.invalidate_all()
+            for mode in modes[1:]:
+                diffs = compare(results['orm'], results[mode])
+                print('%s %s: %d records, %s' % (
+                    file_format, mode, len(results[mode]),
+                    diffs and '%d differences' % len(diffs) or 'same as orm'))
+                for diff in diffs[:MAX_REPORTED_DIFFS]:
+                    print('    ' + diff)
+                failed = failed or bool(diffs)
+        cr.rollback()
+    return failed and 1 or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# Copyright 2024 Akretion France (http://www.akretion.com)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Generate synthetic files for each file format of account_move_csv_import.
+
+The files only use the master data created by bench_import.py
+(journal BZ, accounts 411900, 512900 and 7069xxxx, partners BENCHxxxxxx,
+analytic accounts ANxxxx), so they can be imported in any database
+where this script has been run.
+
+Usage:
+    python generate_files.py --format fec_txt --lines 100000 -o /tmp/fec.txt
+"""
+
+import argparse
+import csv
+import random
+import zipfile
+from datetime import date, timedelta
+from xml.sax.saxutils import escape
+
+FORMATS = [
+    'genericcsv', 'genericxlsx', 'genericxls', 'genericods', 'fec_txt',
+    'nibelis', 'quadra', 'extenso', 'cielpaye', 'payfit']
+# file_format of the wizard for each generated format
+WIZARD_FORMAT = {
+    'genericxls': 'genericxlsx',
+    'genericods': 'genericxlsx',
+    }
+EXTENSION = {
+    'genericcsv': 'csv', 'genericxlsx': 'xlsx', 'genericxls': 'xls',
+    'genericods': 'ods', 'fec_txt': 'txt', 'nibelis': 'csv', 'quadra': 'txt',
+    'extenso': 'txt', 'cielpaye': 'txt', 'payfit': 'csv'}
+JOURNAL = 'BZ'
+RECEIVABLE_ACCOUNT = '411900'
+BANK_ACCOUNT = '512900'
+INCOME_ACCOUNT_PREFIX = '7069'
+PARTNER_PREFIX = 'BENCH'
+ANALYTIC_PREFIX = 'AN'
+DATE_COUNT = 28
+
+
+def income_account_codes(count):
+    return ['%s%04d' % (INCOME_ACCOUNT_PREFIX, i) for i in range(count)]
+
+
+def partner_refs(count):
+    return ['%s%06d' % (PARTNER_PREFIX, i) for i in range(count)]
+
+
+def analytic_codes(count):
+    return ['%s%04d' % (ANALYTIC_PREFIX, i) for i in range(count)]
+
+
+def generate_lines(lines, accounts=100, partners=1000, analytics=10, seed=42):
+    """Yield about `lines` pivot-like dicts, grouped in balanced moves.
+
+    Moves go by pairs: an invoice (receivable / income lines) and its payment
+    (bank / receivable), the 2 receivable lines share a reconcile ref."""
+    rnd = random.Random(seed)
+    income_codes = income_account_codes(accounts)
+    refs = partner_refs(partners)
+    ana_codes = analytic_codes(analytics)
+    start_date = date(2024, 1, 1)
+    dates = [start_date + timedelta(days=i) for i in range(DATE_COUNT)]
+    line_count = 0
+    pair = 0
+    while line_count < lines:
+        pair += 1
+        move_date = dates[pair % DATE_COUNT]
+        partner = refs[rnd.randrange(len(refs))]
+        rec_ref = 'R%d' % pair
+        income_lines = rnd.randint(1, 3)
+        amounts = [rnd.randint(100, 1000000) / 100.0 for i in range(income_lines)]
+        total = round(sum(amounts), 2)
+        invoice = [{
+            'account': RECEIVABLE_ACCOUNT, 'partner': partner,
+            'debit': total, 'credit': 0.0, 'reconcile_ref': rec_ref,
+            'move_name': 'BZI%08d' % pair, 'name': 'Invoice %d' % pair}]
+        for amount in amounts:
+            invoice.append({
+                'account': income_codes[rnd.randrange(len(income_codes))],
+                'analytic': ana_codes and ana_codes[rnd.randrange(len(ana_codes))] or '',
+                'debit': 0.0, 'credit': amount,
+                'move_name': 'BZI%08d' % pair, 'name': 'Sale %d' % pair})
+        payment = [{
+            'account': BANK_ACCOUNT, 'debit': total, 'credit': 0.0,
+            'move_name': 'BZP%08d' % pair, 'name': 'Payment %d' % pair,
+            }, {
+            'account': RECEIVABLE_ACCOUNT, 'partner': partner,
+            'debit': 0.0, 'credit': total, 'reconcile_ref': rec_ref,
+            'move_name': 'BZP%08d' % pair, 'name': 'Payment %d' % pair}]
+        for l in invoice + payment:
+            l.update({'journal': JOURNAL, 'date': move_date, 'ref': 'REF%d' % pair})
+            l.setdefault('partner', '')
+            l.setdefault('analytic', '')
+            l.setdefault('reconcile_ref', '')
+            line_count += 1
+            yield l
+
+
+def fr_amount(amount):
+    return ('%.2f' % amount).replace('.', ',') if amount else ''
+
+
+def write_genericcsv(path, lines):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=',')
+        for l in lines:
+            writer.writerow([
+                l['date'].strftime('%d/%m/%Y'), l['journal'], l['account'],
+                l['partner'], l['analytic'], l['name'],
+                fr_amount(l['debit']), fr_amount(l['credit']),
+                l['ref'], l['reconcile_ref']])
+
+
+def spreadsheet_row(l):
+    return [
+        l['date'], l['journal'], l['account'], l['partner'], l['analytic'],
+        l['name'], l['debit'], l['credit'], l['ref'], l['reconcile_ref']]
+
+
+def write_genericxlsx(path, lines):
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    sh = wb.create_sheet()
+    for l in lines:
+        sh.append(spreadsheet_row(l))
+    wb.save(path)
+
+
+def write_genericxls(path, lines):
+    try:
+        import xlwt
+    except ImportError:
+        raise SystemExit("The python lib 'xlwt' is required to generate XLS files.")
+    wb = xlwt.Workbook()
+    sh = wb.add_sheet('Sheet1')
+    date_style = xlwt.easyxf(num_format_str='DD/MM/YYYY')
+    for i, l in enumerate(lines):
+        if i >= 65535:
+            raise SystemExit('XLS files are limited to 65536 rows.')
+        for j, value in enumerate(spreadsheet_row(l)):
+            if j == 0:
+                sh.write(i, j, value, date_style)
+            else:
+                sh.write(i, j, value)
+    wb.save(path)
+
+
+def ods_cell(value):
+    if isinstance(value, date):
+        return (
+            '<table:table-cell office:value-type="date" office:date-value="%s">'
+            '<text:p>%s</text:p></table:table-cell>' % (value.isoformat(), value.isoformat()))
+    if isinstance(value, float):
+        return (
+            '<table:table-cell office:value-type="float" office:value="%s">'
+            '<text:p>%s</text:p></table:table-cell>' % (value, value))
+    if not value:
+        return '<table:table-cell/>'
+    return (
+        '<table:table-cell office:value-type="string">'
+        '<text:p>%s</text:p></table:table-cell>' % escape(value))
+
+
+def write_genericods(path, lines):
+    # Minimal ODS file, written without any lib
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(
+            zipfile.ZipInfo('mimetype'),
+            'application/vnd.oasis.opendocument.spreadsheet')
+        zf.writestr('META-INF/manifest.xml', (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">'
+            '<manifest:file-entry manifest:full-path="/" manifest:media-type="application/vnd.oasis.opendocument.spreadsheet"/>'
+            '<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+            '</manifest:manifest>'))
+        with zf.open('content.xml', 'w') as f:
+            f.write((
+                '<?xml version="1.0" encoding="UTF-8"?>'
+                '<office:document-content '
+                'xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+                'xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0" '
+                'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" '
+                'office:version="1.2"><office:body><office:spreadsheet>'
+                '<table:table table:name="Sheet1">').encode('utf-8'))
+            for l in lines:
+                f.write(('<table:table-row>%s</table:table-row>' % ''.join(
+                    ods_cell(value) for value in spreadsheet_row(l))).encode('utf-8'))
+            f.write(b'</table:table></office:spreadsheet></office:body></office:document-content>')
+
+
+def write_fec_txt(path, lines):
+    header = [
+        'JournalCode', 'JournalLib', 'EcritureNum', 'EcritureDate', 'CompteNum',
+        'CompteLib', 'CompAuxNum', 'CompAuxLib', 'PieceRef', 'PieceDate',
+        'EcritureLib', 'Debit', 'Credit', 'EcritureLet', 'DateLet', 'ValidDate',
+        'Montantdevise', 'Idevise']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter='\t', lineterminator='\r\n')
+        writer.writerow(header)
+        for l in lines:
+            date_str = l['date'].strftime('%Y%m%d')
+            writer.writerow([
+                l['journal'], 'Bench', l['move_name'], date_str, l['account'], '',
+                l['partner'], '', l['ref'], date_str, l['name'],
+                fr_amount(l['debit']) or '0,00', fr_amount(l['credit']) or '0,00',
+                l['reconcile_ref'], '', date_str, '', ''])
+
+
+def write_nibelis(path, lines):
+    with open(path, 'w', newline='', encoding='latin1') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['header'] * 32)
+        for l in lines:
+            row = [''] * 32
+            row[2] = l['journal']
+            row[7] = l['date'].strftime('%y%m%d')
+            row[14] = l['account']
+            row[17] = fr_amount(l['debit'] or l['credit'])
+            row[19] = l['debit'] and 'D' or 'C'
+            row[22] = l['name']
+            row[31] = l['analytic']
+            writer.writerow(row)
+
+
+def write_quadra(path, lines):
+    with open(path, 'w', newline='', encoding='latin1') as f:
+        for l in lines:
+            amount_cents = int(round((l['debit'] or l['credit']) * 100))
+            f.write('M%-8s%-2s000%s %-20s%s%+013d\r\n' % (
+                l['account'].ljust(8, '0')[:8], l['journal'][:2],
+                l['date'].strftime('%d%m%y'), l['name'][:20],
+                l['debit'] and 'D' or 'C', amount_cents))
+            # analytic distribution of the line (100%)
+            if l['analytic']:
+                f.write('I%05d%+013d%-10s\r\n' % (10000, amount_cents, l['analytic'][:10]))
+
+
+def write_extenso(path, lines):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter='\t')
+        for l in lines:
+            writer.writerow([
+                l['journal'], l['date'].strftime('%d%m%Y'), '', l['account'],
+                '', '', '', '', fr_amount(l['debit']), fr_amount(l['credit'])])
+
+
+def write_cielpaye(path, lines):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter='\t')
+        for l in lines:
+            writer.writerow([
+                '', l['journal'], l['date'].strftime('%d/%m/%Y'), l['account'], '',
+                fr_amount(l['debit'] or l['credit']), l['debit'] and 'D' or 'C',
+                '', l['name'], ''])
+
+
+def write_payfit(path, lines):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow([
+            'JournalCode', 'JournalLib', 'EcritureDate', 'CompteNum', 'CompteLib',
+            'Debit', 'Credit', 'AxeLib', 'AxeReference'])
+        for l in lines:
+            writer.writerow([
+                l['journal'], 'Bench', l['date'].strftime('%d/%m/%Y'), l['account'],
+                l['name'], l['debit'] and '%.2f' % l['debit'] or '',
+                l['credit'] and '%.2f' % l['credit'] or '', '', l['analytic']])
+
+
+def generate(file_format, path, lines, accounts=100, partners=1000, analytics=10, seed=42):
+    writer = globals()['write_%s' % file_format]
+    writer(path, generate_lines(lines, accounts, partners, analytics, seed))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--format', required=True, choices=FORMATS)
+    parser.add_argument('--lines', type=int, default=10000)
+    parser.add_argument('--accounts', type=int, default=100, help='Number of income accounts')
+    parser.add_argument('--partners', type=int, default=1000)
+    parser.add_argument('--analytics', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-o', '--output')
+    args = parser.parse_args()
+    path = args.output or 'bench_%s_%d.%s' % (
+        args.format, args.lines, EXTENSION[args.format])
+    generate(
+        args.format, path, args.lines, args.accounts, args.partners,
+        args.analytics, args.seed)
+    print(path)
+
+
+if __name__ == '__main__':
+    main()